@@ -11,7 +11,7 @@ curl -O https://bootstrap.pypa.io/get-pip.py
 python3 get-pip.py --user
 pip install awsebcli --upgrade --user
 
-for name in requests bs4 numpy pandas tqdm regex xldr lxml boto3; do pip install $name; done
+for name in requests bs4 numpy pandas tqdm regex xldr lxml pyarrow boto3; do pip install $name; done
 
 cd /tmp/
 wget https://chromedriver.storage.googleapis.com/2.37/chromedriver_linux64.zip
@@ -0,0 +1,25 @@
+#!/usr/bin/python3
+
+import os, sys, argparse, contextlib
+from cad_lib import ROOT_DIR, PropertyDB
+
+COUNTIES = ['taylor', 'callahan', 'tomgreen', 'jones']
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Changes of county records over a period, from the property database')
+    parser.add_argument('counties', nargs='*', help='counties to compare', default=COUNTIES)
+    parser.add_argument('-since', help='start of the period (YYYY-MM-DD)', required=True)
+    parser.add_argument('-until', help='end of the period (YYYY-MM-DD, default: now)', required=False, default=None)
+    args = parser.parse_args()
+
+    with contextlib.closing(PropertyDB()) as db:
+        for county in args.counties:
+            since = db.version_at(county, args.since)
+            until = db.version_at(county, f'{args.until}T23:59:59') if args.until else None
+            sffx  = f'{args.since}_{args.until}' if args.until else args.since
+            fname = f'{ROOT_DIR}/output/output_{county}/output_{county}_delta_{sffx}.csv'
+            os.makedirs(os.path.dirname(fname), exist_ok=True)
+            db.write_delta(county, since, fname, until=until)
+            sys.stderr.write(f'{fname}\n')
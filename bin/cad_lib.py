@@ -1,4 +1,9 @@
-import os, sys, inspect, time, errno, signal
+import os, sys, inspect, time, errno, signal, asyncio, threading, contextlib, hashlib, json, datetime, statistics, random, glob, fnmatch, shutil, zlib, queue, itertools, sqlite3, csv, re, platform, argparse, functools, subprocess, gzip, io, heapq, tempfile, zipfile, fcntl, multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from urllib.parse import urlparse
+from operator import itemgetter
+# requests (fetching), lxml and bs4 (parsing) and pyarrow (Parquet output) are imported where they
+# are used, so that a script needs only the packages of the parts of this module it runs
 
 def get_script_dir(follow_symlinks=True):
     if getattr(sys, 'frozen', False): # py2exe, PyInstaller, cx_Freeze
@@ -24,6 +29,99 @@ def isnotebook():
 ROOT_DIR    = f'{get_script_dir()}/../'
 EMPTY_LIMIT = 4000 # max improvement value to assume the land is empty 
 
+# Max simultaneous requests per county host, tuned to what each server tolerates
+HOST_IN_FLIGHT    = {
+                        'propaccess.taylor-cad.org'      : 16,
+                        'esearch.callahancad.org'        : 8,
+                        'iswdataclient.azurewebsites.net': 12,
+                        'www.jonescad.org'               : 4,
+                    }
+DEFAULT_IN_FLIGHT = 8
+EXPLORE_FRACTION  = 0.05 # share of never/no longer seen IDs re-probed on every crawl
+ID_BLOCK          = 1000 # IDs in a block where new properties were discovered are all fetched next crawl
+ID_TAIL           = 5000 # IDs past the highest known property that are always probed
+JOURNAL_SYNC      = 100  # journal entries between fsyncs
+HTTP_TIMEOUT      = 60   # seconds without a byte from the server before a request counts as failed
+BACKOFF_BASE      = 1    # first pause after an unhealthy response, doubled on each consecutive one (sec)
+BACKOFF_MAX       = 300  # longest pause between requests to an unhealthy host (sec)
+SEGMENT_BYTES     = 256*2**20 # size at which a page archive starts a new segment
+PARSE_CHUNK       = 64   # pages handed to a parser worker process at once
+PARSE_BATCH       = 4096 # pages looked up in the parse cache and queued for the workers at once
+PARQUET_ROWS      = 65536 # records per row group of the Parquet outputs
+PDF_WORKERS       = 4    # PDFs converted to text at once
+PARSE_FAILURES    = 10   # pages a parser run may fail on whatever its size...
+PARSE_FAIL_SHARE  = 0.01 # ...and share of its pages, above both the run aborts
+SORT_CHUNK        = 100000 # records sorted in memory at once by sorted_records()
+SAMPLE_LINES      = 300    # lines of the published sample of a county's CSV
+WWW_DIR           = '/var/www/html'
+DB_BATCH          = 10000 # records written to the property database at once
+SQL_VARIABLES     = 500    # keys looked up by one SQLite IN (...) query
+DELTA_DAYS        = 7      # days of changes in the published delta files
+DB_INDEXES        = ['school', 'zoning', 'property_use', 'land_area', 'recent_penalty', 'recent_delinq']
+# how BeautifulSoup's HTML tree builder handles the markup PageNode stands in for
+VOID_ELEMENTS     = {'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'keygen', 'link', 'menuitem', 'meta', 'param', 'source',
+                     'track', 'wbr', 'basefont', 'bgsound', 'command', 'frame', 'image', 'isindex', 'nextid', 'spacer'}
+ASCII_SPACES      = ' \n\t\f\r'               # a string of only these is collapsed to '\n' or ' '...
+PRESERVE_SPACES   = {'pre', 'textarea'}       # ...unless inside one of these tags
+STRING_CONTAINERS = {'rt', 'rp', 'style', 'script', 'template'} # strings inside are not part of the text of other tags
+CDATA_TAGS        = {'script', 'style'}       # strings directly inside are written unescaped
+LIST_ATTRIBUTES   = {
+                        '*'     : {'class', 'accesskey', 'dropzone'},
+                        'a'     : {'rel', 'rev'},
+                        'link'  : {'rel', 'rev'},
+                        'td'    : {'headers'},
+                        'th'    : {'headers'},
+                        'form'  : {'accept-charset'},
+                        'object': {'archive'},
+                        'area'  : {'rel'},
+                        'icon'  : {'sizes'},
+                        'iframe': {'sandbox'},
+                        'output': {'for'},
+                    } # attributes holding space-separated lists, split into Python lists
+USER_AGENT        = 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_14_0) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/89.0.4389.114 Safari/537.36'
+
+# Arrow type name of every column the parsers output (see _arrow_type()), a county's Parquet
+# schema is its columns with these types; category is a dictionary-encoded string of few values
+COLUMN_TYPES = {
+                   'prop_id'          : 'int64',
+                   'owner_id'         : 'int64',
+                   'legal_description': 'string',
+                   'prop_address'     : 'string',
+                   'owner_name'       : 'string',
+                   'owner_address'    : 'string',
+                   'transfer_date'    : 'string',
+                   'absentee'         : 'bool',
+                   'empty_land'       : 'bool',
+                   'improvement_value': 'int64',
+                   'property_use'     : 'category',
+                   'zoning'           : 'category',
+                   'land_area'        : 'float64',
+                   'land_dict'        : 'map<string, float64>',
+                   'recent_penalty'   : 'float64',
+                   'recent_delinq'    : 'float64',
+                   'school'           : 'category',
+                   'inactive'         : 'bool',
+               }
+
+# saved lead lists, kept up to date in the PropertyDB and mailed from <ROOT_DIR>/output/leads/<name>.csv
+BAD_OWNERS    = ['SENTER', 'RAILWAY', 'CITY', 'GOVERNMENT', 'GOVT', 'STATE OF', 'PIPE', 'CEMETERY', 'SCHOOL', 'TOWER', 'DISTRICT', 'SYSTEM']
+BAD_ZONING    = "('Commercial', 'Public Street', 'Utility Use')"
+ABSENTEE_LAND = f"absentee AND empty_land AND NOT COALESCE(inactive, 0) AND COALESCE(zoning, '') NOT IN {BAD_ZONING}"
+LEAD_VIEWS    = {
+                    'taylor_delinquent_land'       : ('taylor', f'{ABSENTEE_LAND} AND recent_penalty AND land_area BETWEEN 0.9 AND 20.1',
+                                                      'recent_penalty DESC'),
+                    'taylor_wylie_empty_land'      : ('taylor', f"{ABSENTEE_LAND} AND recent_penalty=0.0 AND school='WYLIE' "
+                                                                 "AND land_area BETWEEN 0.9 AND 10.1", 'prop_id'),
+                    'taylor_delinquent_multifamily': ('taylor', "property_use='MULTIPLE RESIDENCE' AND recent_delinq", 'prop_id'),
+                    'jones_hawley_empty_lots'      : ('jones', "empty_land AND absentee AND school GLOB 'HAWLEY*' "
+                                                               "AND land_area BETWEEN 0.1 AND 5 AND property_use<'E'", 'prop_id'),
+                } # name -> (county, SQL condition on table properties, order of the mailing list)
+
+if isnotebook():
+    from tqdm.notebook import tqdm, trange
+else:
+    from tqdm import tqdm, trange
+
 class FileLock(object):
     
     def __init__(self, file_name, timeout=10, delay=.05):
@@ -96,3 +194,1794 @@ class WebDriver:
 
     def __exit__(self, exc_type, exc_val, exc_tb):
         self.driver.quit()
+
+class BrowserPool:
+    """
+    Warm browser instances shared by worker threads, make_driver() starts a new one.
+    A driver that raises while checked out with driver() is quit and replaced on next use.
+    """
+
+    def __init__(self, make_driver, size):
+        self.make_driver = make_driver
+        self.idle        = queue.Queue()
+        self.slots       = threading.Semaphore(size)
+
+    @contextlib.contextmanager
+    def driver(self):
+        with self.slots:
+            try:
+                driver = self.idle.get_nowait()
+            except queue.Empty:
+                driver = self.make_driver()
+
+            try:
+                yield driver
+            except:
+                with contextlib.suppress(Exception):
+                    driver.quit()
+                raise
+
+            self.idle.put(driver)
+
+    def close(self):
+        while not self.idle.empty():
+            with contextlib.suppress(Exception):
+                self.idle.get_nowait().quit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class HostLimiter:
+    """
+    Adaptive in-flight budget of one county host, shared by all workers hitting it.
+    The limit grows by one after a full window of healthy responses, up to max_in_flight,
+    and is halved on a 5xx, timeout or expired session. Each consecutive unhealthy response
+    also pauses every worker for an exponentially growing, jittered backoff.
+    """
+
+    def __init__(self, max_in_flight):
+        self.max_in_flight = max_in_flight
+        self.limit         = max(1, max_in_flight//2)
+        self.active        = 0
+        self.healthy       = 0
+        self.failures      = 0
+        self.resume_at     = 0.0
+        self.cond          = threading.Condition()
+
+    def acquire(self):
+        with self.cond:
+            while True:
+                pause = self.resume_at - time.monotonic()
+                if pause>0:
+                    self.cond.wait(pause)
+                elif self.active>=self.limit:
+                    self.cond.wait()
+                else:
+                    break
+            self.active += 1
+
+    def release(self, healthy):
+        with self.cond:
+            self.active -= 1
+
+            if healthy:
+                self.failures  = 0
+                self.healthy  += 1
+                if self.healthy>=self.limit and self.limit<self.max_in_flight:
+                    self.limit, self.healthy = self.limit+1, 0
+            else:
+                self.failures += 1
+                self.healthy   = 0
+                self.limit     = max(1, self.limit//2)
+                backoff        = min(BACKOFF_MAX, BACKOFF_BASE*2**(self.failures-1)) * random.uniform(0.5, 1.5)
+                self.resume_at = max(self.resume_at, time.monotonic()+backoff)
+
+            self.cond.notify_all()
+
+_host_limiters      = {}
+_host_limiters_lock = threading.Lock()
+
+def host_limiter(host, max_in_flight=None):
+    """The process-wide limiter of a host, created on first use"""
+    with _host_limiters_lock:
+        if host not in _host_limiters:
+            _host_limiters[host] = HostLimiter(max_in_flight or HOST_IN_FLIGHT.get(host, DEFAULT_IN_FLIGHT))
+        return _host_limiters[host]
+
+
+class FetchError(Exception):
+    """A request that failed on all of its attempts"""
+
+
+class CountySession:
+    """
+    Pooled keep-alive HTTP session for one county host, shared by all fetch workers.
+    Cookies are taken from cookie_url; when a stale session is detected they are
+    refreshed once and the new ones are seen by every worker. Requests go through
+    the HostLimiter of the host.
+    """
+
+    def __init__(self, cookie_url, pool_size=None, timeout=HTTP_TIMEOUT):
+        import requests
+        host            = urlparse(cookie_url).hostname
+        self.cookie_url = cookie_url
+        self.timeout    = timeout
+        self.pool_size  = pool_size or HOST_IN_FLIGHT.get(host, DEFAULT_IN_FLIGHT)
+        self.limiter    = host_limiter(host, self.pool_size)
+        self.lock       = threading.Lock()
+        self.generation = 0
+        self.session    = requests.Session()
+        adapter         = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size, pool_block=True)
+
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.headers.update({'user-agent': USER_AGENT})
+        self.refresh(self.generation)
+
+    def refresh(self, generation):
+        import requests
+        # only the first worker reporting a given generation as stale gets new cookies
+        with self.lock:
+            if generation==self.generation:
+                self.session.cookies.clear()
+                with contextlib.suppress(requests.ConnectionError, requests.Timeout):
+                    self.session.get(self.cookie_url, timeout=self.timeout)
+                self.generation += 1
+
+    def get(self, url, attempts=1, headers=None, stale=None):
+        return self.request('GET', url, attempts=attempts, headers=headers, stale=stale)
+
+    def post(self, url, data, attempts=1, headers=None, stale=None):
+        return self.request('POST', url, attempts=attempts, headers=headers, stale=stale, data=data)
+
+    def request(self, method, url, attempts=1, headers=None, stale=None, data=None):
+        """
+        Sends the request, retrying up to attempts times, FetchError if all fail. A response is
+        unhealthy if it is not ok or stale(response) is true (e.g. the county shows its
+        session-expiry page).
+        """
+        import requests
+        for trial in range(attempts):
+            generation = self.generation
+            response   = None
+
+            self.limiter.acquire()
+            try:
+                response = self.session.request(method, url, headers=headers, data=data, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout): # incl. pooled connection dropped by the server
+                pass
+            finally:
+                healthy = response is not None and response.ok and not (stale and stale(response))
+                self.limiter.release(healthy)
+
+            if healthy:
+                return response
+
+            if trial==attempts-1:
+                raise FetchError(f'Connection timeout at {url}')
+
+            self.refresh(generation)
+
+
+class SessionIdPool:
+    """
+    Pre-warmed pool of URL session IDs (e.g. jonescad.org '(S(...))' sessions) shared by
+    concurrent workers. A worker checks an ID out for its own use only; an ID behind a
+    failed request is retired and a background thread generates the replacement. After
+    attempts generations in a row fail, or when no ID turns up within timeout seconds,
+    acquire() raises FetchError instead of waiting.
+    """
+
+    def __init__(self, generate, size, attempts=10, timeout=HTTP_TIMEOUT):
+        self.generate = generate
+        self.attempts = attempts
+        self.timeout  = timeout
+        self.idle     = queue.Queue()
+        self.missing  = threading.Semaphore(size)
+        self.lock     = threading.Lock()
+        self.stats    = {'generated': 0, 'used': 0, 'retired': 0}
+        self.failed   = False
+        self.closed   = False
+        self.thread   = threading.Thread(target=self._replenish, daemon=True)
+        self.thread.start()
+
+    def _count(self, stat):
+        with self.lock:
+            self.stats[stat] += 1
+
+    def _replenish(self):
+        failures = 0
+        while True:
+            self.missing.acquire()
+            if self.closed:
+                return
+
+            try:
+                session_id = self.generate()
+            except Exception:
+                failures += 1
+                if failures>=self.attempts: # the website stopped handing out sessions
+                    self.failed = True
+                    return
+                time.sleep(min(BACKOFF_BASE*2**(failures-1), BACKOFF_MAX))
+                self.missing.release()
+                continue
+
+            failures = 0
+            self._count('generated')
+            self.idle.put(session_id)
+
+    def acquire(self):
+        deadline = time.time()+self.timeout
+        while True:
+            with contextlib.suppress(queue.Empty):
+                return self.idle.get(timeout=max(0, min(1, deadline-time.time())))
+            if self.failed:
+                raise FetchError(f'No session IDs after {self.attempts} failed attempts')
+            if time.time()>=deadline:
+                raise FetchError(f'No session ID within {self.timeout} sec')
+
+    def release(self, session_id, healthy):
+        self._count('used')
+        if healthy:
+            self.idle.put(session_id)
+        else:
+            self._count('retired')
+            self.missing.release()
+
+    def close(self):
+        self.closed = True
+        self.missing.release()
+
+
+class PageArchive:
+    """
+    Packed store of raw pages. Pages are zlib-compressed and appended to segment files
+    <archive_dir>/seg_NNNNN.dat; <archive_dir>/index.log is an append-only log of
+    'page segment offset length' lines in which the last line of a page wins (segment -1
+    marks a removed page). Superseded copies stay in the segments until compact_archive().
+    """
+
+    def __init__(self, archive_dir):
+        os.makedirs(archive_dir, exist_ok=True)
+        self.archive_dir = archive_dir
+        self.lock        = threading.Lock()
+        self.index       = {}
+        self.readers     = {}
+        self.writer      = None
+        index_fname      = f'{archive_dir}/index.log'
+
+        with contextlib.suppress(FileNotFoundError):
+            with open(index_fname, 'r') as f:
+                for line in f:
+                    fields = line.split()
+                    if not line.endswith('\n') or len(fields)!=4: # torn write of a killed run
+                        continue
+                    page, segment, offset, length = fields[0], int(fields[1]), int(fields[2]), int(fields[3])
+                    if segment<0:
+                        self.index.pop(page, None)
+                    else:
+                        self.index[page] = (segment, offset, length)
+
+        segments     = sorted(int(f[4:9]) for f in os.listdir(archive_dir) if f.startswith('seg_'))
+        self.segment = segments[-1] if segments else 0
+        self.index_f = open(index_fname, 'a')
+
+    def segment_fname(self, segment):
+        return f'{self.archive_dir}/seg_{segment:05d}.dat'
+
+    def __contains__(self, page):
+        return page in self.index
+
+    def pages(self):
+        return list(self.index)
+
+    def get(self, page):
+        segment, offset, length = self.index[page]
+
+        with self.lock:
+            if segment not in self.readers:
+                self.readers[segment] = os.open(self.segment_fname(segment), os.O_RDONLY)
+            fd = self.readers[segment]
+
+        return zlib.decompress(os.pread(fd, length, offset))
+
+    def items(self, pages=None):
+        """Streams (page, content) pairs, by default in storage order for sequential reads"""
+        if pages is None:
+            pages = sorted(self.index, key=self.index.get)
+        for page in pages:
+            yield page, self.get(page)
+
+    @contextlib.contextmanager
+    def locked(self):
+        # other processes may append to the same archive (overlapping fetches, pack_pages.py), the
+        # flock on the index goes away with a killed holder
+        with self.lock:
+            fcntl.flock(self.index_f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                self.index_f.flush()
+                fcntl.flock(self.index_f, fcntl.LOCK_UN)
+
+    def put(self, page, content):
+        data = zlib.compress(content)
+
+        with self.locked():
+            while os.path.exists(self.segment_fname(self.segment+1)): # started by another process
+                self.segment += 1
+                if self.writer is not None:
+                    os.close(self.writer)
+                    self.writer = None
+            if self.writer is None:
+                self.writer = os.open(self.segment_fname(self.segment), os.O_WRONLY|os.O_CREAT|os.O_APPEND, 0o644)
+            if os.fstat(self.writer).st_size>=SEGMENT_BYTES:
+                os.close(self.writer)
+                self.segment += 1
+                self.writer   = os.open(self.segment_fname(self.segment), os.O_WRONLY|os.O_CREAT|os.O_APPEND, 0o644)
+
+            offset = os.fstat(self.writer).st_size
+            view   = memoryview(data)
+            while view:
+                view = view[os.write(self.writer, view):]
+
+            self.index[page] = (self.segment, offset, len(data))
+            self.index_f.write(f'{page} {self.segment} {offset} {len(data)}\n')
+
+    def delete(self, page):
+        with self.locked():
+            if self.index.pop(page, None) is not None:
+                self.index_f.write(f'{page} -1 0 0\n')
+
+    def close(self):
+        with self.lock:
+            for fd in list(self.readers.values()) + ([self.writer] if self.writer is not None else []):
+                os.close(fd)
+            self.readers, self.writer = {}, None
+            self.index_f.close()
+
+def compact_archive(archive_dir):
+    """Rewrites the live pages of an archive into fresh segments, dropping superseded and removed copies"""
+    old_archive = PageArchive(archive_dir)
+    new_archive = PageArchive(f'{archive_dir}.compact')
+
+    for page, content in old_archive.items():
+        new_archive.put(page, content)
+
+    old_archive.close()
+    new_archive.close()
+    os.rename(archive_dir, f'{archive_dir}.old')
+    os.rename(f'{archive_dir}.compact', archive_dir)
+    shutil.rmtree(f'{archive_dir}.old')
+
+
+def decode_page(content):
+    # same text as open(fname, 'r') gives, universal newlines included
+    return content.decode('utf-8').replace('\r\n', '\n').replace('\r', '\n')
+
+
+class PageStore:
+    """
+    Raw pages of a county: kept in its PageArchive (<data_dir>/archive) once the county
+    has been packed with pack_pages.py, otherwise as <data_dir>/<page>.html files.
+    """
+
+    def __init__(self, data_dir):
+        self.data_dir = data_dir
+        archive_dir   = f'{data_dir}/archive'
+        self.archive  = PageArchive(archive_dir) if os.path.isdir(archive_dir) else None
+
+    def page_fname(self, page):
+        return f'{self.data_dir}/{page}.html'
+
+    def pages(self, pattern='*'):
+        if self.archive is not None:
+            return sorted(fnmatch.filter(self.archive.pages(), pattern))
+        return sorted(os.path.basename(fname)[:-5] for fname in glob.glob(f'{self.data_dir}/{pattern}.html'))
+
+    def exists(self, page):
+        if self.archive is not None:
+            return page in self.archive
+        return os.path.exists(self.page_fname(page))
+
+    def read_bytes(self, page):
+        if self.archive is None:
+            with open(self.page_fname(page), 'rb') as f:
+                return f.read()
+        try:
+            return self.archive.get(page)
+        except KeyError:
+            raise FileNotFoundError(page)
+
+    def read(self, page):
+        return decode_page(self.read_bytes(page))
+
+    def content_hash(self, page):
+        """
+        sha1 of the page as stored, not the fetcher's manifest entry, which lags behind the page
+        when a fetch is killed before saving the manifest
+        """
+        return hashlib.sha1(self.read_bytes(page)).hexdigest()
+
+    def write(self, page, content):
+        if self.archive is not None:
+            self.archive.put(page, content)
+        else:
+            with open(self.page_fname(page), 'wb') as f:
+                f.write(content)
+
+    def remove(self, page):
+        if self.archive is not None:
+            self.archive.delete(page)
+        else:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(self.page_fname(page))
+
+
+class SnapshotStore:
+    """
+    Content-addressed history of the raw pages of a county, in <ROOT_DIR>/data/snapshots/<county>:
+    every distinct page content is kept once, keyed by its sha1, in the blobs/ PageArchive,
+    and every crawl only adds a <date>.json manifest {page: sha1}.
+    """
+
+    def __init__(self, county):
+        self.snapshot_dir = f'{ROOT_DIR}/data/snapshots/{county}'
+        self.blobs        = PageArchive(f'{self.snapshot_dir}/blobs')
+
+    def dates(self):
+        return sorted(fname[:-5] for fname in os.listdir(self.snapshot_dir) if fname.endswith('.json'))
+
+    def record(self, store, hashes=None, date=None):
+        """Snapshots every page of store; known hashes (e.g. from the PageManifest) spare re-reading unchanged pages"""
+        hashes   = hashes or {}
+        date     = date or datetime.date.today().isoformat()
+        snapshot = {}
+
+        for page in tqdm(store.pages(), desc='snapshot'):
+            content_hash = hashes.get(page)
+            if content_hash not in self.blobs:
+                content      = store.read_bytes(page)
+                content_hash = hashlib.sha1(content).hexdigest()
+                if content_hash not in self.blobs:
+                    self.blobs.put(content_hash, content)
+            snapshot[page] = content_hash
+
+        fname = f'{self.snapshot_dir}/{date}.json'
+        with open(f'{fname}.tmp', 'w') as f:
+            json.dump(snapshot, f)
+        os.replace(f'{fname}.tmp', fname)
+
+    def snapshot(self, date):
+        """Read-only PageStore of the crawl recorded on date"""
+        return Snapshot(self.blobs, f'{self.snapshot_dir}/{date}.json')
+
+class Snapshot:
+    """Pages of one recorded crawl, with the read interface of PageStore"""
+
+    def __init__(self, blobs, fname):
+        self.blobs = blobs
+        with open(fname, 'r') as f:
+            self.hashes = json.load(f)
+
+    def pages(self, pattern='*'):
+        return sorted(fnmatch.filter(self.hashes, pattern))
+
+    def exists(self, page):
+        return page in self.hashes
+
+    def read_bytes(self, page):
+        try:
+            return self.blobs.get(self.hashes[page])
+        except KeyError:
+            raise FileNotFoundError(page)
+
+    def read(self, page):
+        return decode_page(self.read_bytes(page))
+
+    def content_hash(self, page):
+        try:
+            return self.hashes[page]
+        except KeyError:
+            raise FileNotFoundError(page)
+
+
+class PageManifest:
+    """
+    Per-county record of the fetched pages, kept in <data_dir>/manifest.json:
+    {page: {'hash': sha1 of the content, 'fetched': time, 'etag': ..., 'last_modified': ...}},
+    where page is the PageStore name of the page. Pages written or removed during
+    the run (and the interrupted run it resumes) are listed in <data_dir>/changed_pages.json
+    for the parsers. A run fetching only the pages matching patterns (e.g. one of the Jones
+    loops) leaves the entries and changed pages of the others as the last run saved them.
+    """
+
+    def __init__(self, data_dir, resume=False, patterns=('*',)):
+        self.data_dir      = data_dir
+        self.fname         = f'{data_dir}/manifest.json'
+        self.changed_fname = f'{data_dir}/changed_pages.json'
+        self.patterns      = patterns
+        self.lock          = threading.Lock()
+        self.changed       = {page for page in changed_pages(data_dir) or set() if self.owns(page)} if resume else set()
+        self.store         = PageStore(data_dir)
+        self.entries       = self.load()
+
+    def owns(self, page):
+        return any(fnmatch.fnmatch(page, pattern) for pattern in self.patterns)
+
+    def load(self):
+        try:
+            with open(self.fname, 'r') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def conditional_headers(self, page):
+        entry   = self.entries.get(page, {})
+        headers = {}
+
+        # validators are useless if the local copy is gone
+        if self.store.exists(page):
+            if entry.get('etag'):
+                headers['if-none-match'] = entry['etag']
+            if entry.get('last_modified'):
+                headers['if-modified-since'] = entry['last_modified']
+
+        return headers
+
+    def not_modified(self, page, response):
+        if response.status_code!=304:
+            return False
+
+        with self.lock:
+            self.entries[page]['fetched'] = datetime.datetime.now().isoformat(timespec='seconds')
+
+        return True
+
+    def write_page(self, page, response):
+        content_hash = hashlib.sha1(response.content).hexdigest()
+        entry        = {
+                           'hash'         : content_hash,
+                           'fetched'      : datetime.datetime.now().isoformat(timespec='seconds'),
+                           'etag'         : response.headers.get('etag'),
+                           'last_modified': response.headers.get('last-modified')
+                       }
+
+        with self.lock:
+            old_entry          = self.entries.get(page, {})
+            changed            = old_entry.get('hash')!=content_hash or not self.store.exists(page)
+            self.entries[page] = entry
+            if changed:
+                self.changed.add(page)
+
+        if changed:
+            self.store.write(page, response.content)
+
+        return changed
+
+    def hashes(self):
+        with self.lock:
+            return {page: entry['hash'] for page, entry in self.entries.items()}
+
+    def remove_page(self, page):
+        self.store.remove(page) # property was removed from the county website
+
+        with self.lock:
+            if self.entries.pop(page, None) is not None:
+                self.changed.add(page)
+
+    def recover(self, pages):
+        """
+        Brings the entries of pages up to date with the store after a killed run, which may have
+        written or removed them without saving the manifest, marking the differing ones changed
+        """
+        for page in pages:
+            content_hash = hashlib.sha1(self.store.read_bytes(page)).hexdigest() if self.store.exists(page) else None
+            with self.lock:
+                entry = self.entries.get(page)
+                if content_hash is None and entry is not None:
+                    del self.entries[page]
+                    self.changed.add(page)
+                elif content_hash is not None and (entry is None or entry['hash']!=content_hash):
+                    self.entries[page] = {'hash': content_hash, 'fetched': datetime.datetime.now().isoformat(timespec='seconds'),
+                                          'etag': None, 'last_modified': None}
+                    self.changed.add(page)
+
+    def save(self):
+        with self.lock, open(f'{self.fname}.lock', 'a') as lock_f:
+            fcntl.flock(lock_f, fcntl.LOCK_EX) # held until closed, even by a killed run
+            # what other runs saved meanwhile for the pages this one does not fetch
+            others       = {page for page in changed_pages(self.data_dir) or set() if not self.owns(page)}
+            self.entries = {**{page: entry for page, entry in self.load().items() if not self.owns(page)},
+                            **{page: entry for page, entry in self.entries.items() if self.owns(page)}}
+            for fname, content in [(self.fname, self.entries), (self.changed_fname, sorted(self.changed | others))]:
+                with open(f'{fname}.tmp', 'w') as f:
+                    json.dump(content, f)
+                os.replace(f'{fname}.tmp', fname)
+
+def changed_pages(data_dir):
+    """Pages written or removed by the last fetcher run, None if the fetcher does not keep a manifest"""
+    try:
+        with open(f'{data_dir}/changed_pages.json', 'r') as f:
+            return set(json.load(f))
+    except FileNotFoundError:
+        return None
+
+def page_id(page):
+    """Property (or owner) ID a page is named after, 'prop_000123' -> 123"""
+    return int(re.search(r'\d+$', page)[0])
+
+
+class IdIndex:
+    """
+    Known-ID index of a county built from previous crawls, kept in <data_dir>/id_index.json.
+    plan() picks the IDs worth requesting: known-live IDs, a tail past the highest one,
+    blocks where new IDs showed up last time and a rotating exploration sample of the rest,
+    so the whole numeric space is still covered every 1/explore crawls.
+    """
+
+    def __init__(self, data_dir):
+        self.fname = f'{data_dir}/id_index.json'
+
+        try:
+            with open(self.fname, 'r') as f:
+                index = json.load(f)
+            self.live       = set(index['live'])
+            self.hot_blocks = set(index['hot_blocks'])
+            self.crawls     = index['crawls']
+        except FileNotFoundError: # first crawl has to probe everything
+            self.live, self.hot_blocks, self.crawls = None, set(), 0
+
+    def plan(self, id_ranges, explore=EXPLORE_FRACTION):
+        if self.live is None:
+            return [prop_id for id_range in id_ranges for prop_id in range(*id_range)]
+
+        period = max(1, round(1/explore)) if explore else None
+        ids    = []
+
+        for begin_id, end_id in id_ranges:
+            last_id = max((prop_id for prop_id in self.live if begin_id<=prop_id<end_id), default=begin_id-1)
+
+            for prop_id in range(begin_id, end_id):
+                if (prop_id in self.live or last_id<prop_id<=last_id+ID_TAIL or prop_id//ID_BLOCK in self.hot_blocks
+                    or period and (prop_id+self.crawls)%period==0):
+                    ids.append(prop_id)
+
+        return ids
+
+    def update(self, outcomes, id_ranges):
+        """
+        outcomes: {prop_id: 'saved'|'unchanged'|'removed'|...} of the last crawl over id_ranges,
+        only the hot blocks within those ranges are re-evaluated
+        """
+        first_crawl     = self.live is None
+        self.live       = self.live or set()
+        self.hot_blocks = {block for block in self.hot_blocks
+                           if not any(block*ID_BLOCK<end_id and begin_id<(block+1)*ID_BLOCK for begin_id, end_id in id_ranges)}
+
+        for prop_id, outcome in outcomes.items():
+            if outcome=='removed':
+                self.live.discard(prop_id)
+            elif outcome in ('saved', 'unchanged'):
+                if not first_crawl and prop_id not in self.live:
+                    self.hot_blocks.add(prop_id//ID_BLOCK)
+                self.live.add(prop_id)
+
+        self.crawls += 1
+
+    def gap_stats(self):
+        live = sorted(self.live or [])
+        gaps = [b-a for a, b in zip(live[:-1], live[1:])]
+        return {
+                   'live'      : len(live),
+                   'median_gap': statistics.median(gaps) if gaps else None,
+                   'max_gap'   : max(gaps) if gaps else None,
+                   'big_gaps'  : sum(gap>ID_BLOCK for gap in gaps),
+                   'hot_blocks': len(self.hot_blocks)
+               }
+
+    def save(self):
+        index = {'live': sorted(self.live or []), 'hot_blocks': sorted(self.hot_blocks), 'crawls': self.crawls, 'gap_stats': self.gap_stats()}
+        with open(f'{self.fname}.tmp', 'w') as f:
+            json.dump(index, f)
+        os.replace(f'{self.fname}.tmp', self.fname)
+
+
+class FetchJournal:
+    """
+    Append-only progress journal of a fetcher run, <data_dir>/<name>.log with one
+    'id outcome' line per completed ID. A resumed run skips every ID already done,
+    only the failed ones are tried again.
+    """
+
+    def __init__(self, data_dir, resume=False, name='journal'):
+        self.fname     = f'{data_dir}/{name}.log'
+        self.completed = {}
+        self.unsynced  = 0
+
+        if resume:
+            with contextlib.suppress(FileNotFoundError):
+                with open(self.fname, 'r') as f:
+                    for line in f:
+                        fields = line.split()
+                        if not line.endswith('\n') or len(fields)!=2: # torn write of a killed run
+                            continue
+                        prop_id, outcome = int(fields[0]), fields[1]
+                        if outcome=='failed':
+                            self.completed.pop(prop_id, None)
+                        else:
+                            self.completed[prop_id] = outcome
+
+        self.f = open(self.fname, 'a' if resume else 'w')
+
+    def pending(self, ids):
+        return [prop_id for prop_id in ids if prop_id not in self.completed]
+
+    def record(self, prop_id, outcome):
+        self.f.write(f'{prop_id} {outcome}\n')
+        self.f.flush()
+        self.unsynced += 1
+
+        if self.unsynced>=JOURNAL_SYNC:
+            os.fsync(self.f.fileno())
+            self.unsynced = 0
+
+    def close(self):
+        if not self.f.closed:
+            self.f.flush()
+            os.fsync(self.f.fileno())
+            self.f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.close()
+
+
+async def _fetch_worker(loop, executor, fetch_func, id_iter, results, progress, journal):
+    # the iterator is shared by all workers, it is only advanced from the event loop thread
+    for item in id_iter:
+        try:
+            results[item] = await loop.run_in_executor(executor, fetch_func, item)
+        except Exception as e:
+            if journal is None:
+                raise
+            sys.stderr.write(f'Fetching {item} failed: {e}\n')
+            results[item] = 'failed'
+
+        if journal is not None:
+            journal.record(item, results[item])
+
+        progress.update(1)
+
+async def _fetch_all(fetch_func, ids, in_flight, progress, journal):
+    loop    = asyncio.get_running_loop()
+    id_iter = iter(ids)
+    results = {}
+
+    with ThreadPoolExecutor(max_workers=in_flight) as executor:
+        workers = [asyncio.ensure_future(_fetch_worker(loop, executor, fetch_func, id_iter, results, progress, journal))
+                   for _ in range(in_flight)]
+        try:
+            await asyncio.gather(*workers)
+        except:
+            for worker in workers:
+                worker.cancel()
+            raise
+
+    return results
+
+def fetch_concurrently(fetch_func, ids, url, in_flight=None, journal=None):
+    """
+    Runs the blocking fetch_func(id) for every id in a single process, keeping at most
+    in_flight requests open against the host of url (HOST_IN_FLIGHT by default).
+    Returns a dictionary {id: fetch_func(id)}. Without a journal the first exception
+    stops the whole run, with one the ID is recorded as 'failed' and the run goes on.
+    """
+    host      = urlparse(url).hostname
+    in_flight = in_flight or HOST_IN_FLIGHT.get(host, DEFAULT_IN_FLIGHT)
+    ids       = list(ids)
+
+    with tqdm(total=len(ids), desc=host) as progress:
+        return asyncio.run(_fetch_all(fetch_func, ids, in_flight, progress, journal))
+
+
+class PageNode:
+    """
+    lxml element behind the subset of the BeautifulSoup Tag interface the parsers use:
+    find_all, text, strings, contents, attrs, node['attr'] and str(node) as markup, with the
+    strings and attributes as BeautifulSoup would have made them of the same markup.
+    """
+    __slots__ = ('element',)
+
+    def __init__(self, element):
+        self.element = element
+
+    def find_all(self, name):
+        return [PageNode(element) for element in self.element.iterdescendants(name)]
+
+    @property
+    def text(self):
+        return ''.join(self.strings)
+
+    @property
+    def strings(self):
+        element = self.element
+        kind    = element.tag if element.tag in STRING_CONTAINERS else None
+        return [string for string, string_kind in _strings(element, *_string_context(element)) if string_kind==kind]
+
+    @property
+    def contents(self):
+        element     = self.element
+        _, preserve = _string_context(element)
+        contents    = [_collapse(element.text, preserve)] if element.text else []
+        for child in element:
+            contents.append(PageNode(child) if isinstance(child.tag, str) else child.text or '') # comments as their text
+            if child.tail:
+                contents.append(_collapse(child.tail, preserve))
+        return contents
+
+    @property
+    def attrs(self):
+        return {key: _attribute(self.element.tag, key, value) for key, value in self.element.attrib.items()}
+
+    def __getitem__(self, key):
+        return _attribute(self.element.tag, key, self.element.attrib[key])
+
+    def __str__(self):
+        return _markup(self.element, _string_context(self.element)[1])
+
+
+@functools.lru_cache(maxsize=None)
+def _xpath(expression):
+    from lxml import etree
+    return etree.XPath(expression)
+
+def _attribute(tag, key, value):
+    if key in LIST_ATTRIBUTES['*'] or key in LIST_ATTRIBUTES.get(tag, ()):
+        return value.split()
+    return value
+
+def _collapse(string, preserve):
+    if preserve or string.strip(ASCII_SPACES):
+        return string
+    return '\n' if '\n' in string else ' '
+
+def _string_context(element):
+    """STRING_CONTAINERS tag the strings directly inside element belong to (None for the text), and whether they keep their spaces"""
+    ancestors = [element, *element.iterancestors()]
+    kind      = next((ancestor.tag for ancestor in ancestors if ancestor.tag in STRING_CONTAINERS), None)
+    return kind, any(ancestor.tag in PRESERVE_SPACES for ancestor in ancestors)
+
+def _strings(element, kind, preserve):
+    """(string, kind) of every string within element in document order, comments left out"""
+    if element.text:
+        yield _collapse(element.text, preserve), kind
+    for child in element:
+        if isinstance(child.tag, str):
+            yield from _strings(child, child.tag if child.tag in STRING_CONTAINERS else kind, preserve or child.tag in PRESERVE_SPACES)
+        if child.tail:
+            yield _collapse(child.tail, preserve), kind
+
+def _escape(text):
+    # BeautifulSoup's "minimal" output formatter
+    return text.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+
+def _quote(value):
+    # in double quotes, single ones if the value holds only double quotes
+    if '"' in value and "'" not in value:
+        return f"'{value}'"
+    return '"' + value.replace('"', '&quot;') + '"'
+
+def _markup(element, preserve=False):
+    if not isinstance(element.tag, str):
+        return f'<!--{element.text or ""}-->'
+    preserve = preserve or element.tag in PRESERVE_SPACES
+    escape   = (lambda string: string) if element.tag in CDATA_TAGS else _escape
+    # attrs keep the document order as on a BeautifulSoup tag, but str(tag) writes them sorted by
+    # name (bs4's Formatter.attributes), so markup matched against parser output stays the same
+    attrs    = ''.join(f' {key}={_quote(_escape(" ".join(value) if isinstance(value, list) else value))}'
+                       for key, value in sorted((key, _attribute(element.tag, key, value)) for key, value in element.attrib.items()))
+    if element.tag in VOID_ELEMENTS and not len(element) and not element.text:
+        return f'<{element.tag}{attrs}/>'
+    inner = [escape(_collapse(element.text, preserve))] if element.text else []
+    for child in element:
+        inner.append(_markup(child, preserve))
+        if child.tail:
+            inner.append(escape(_collapse(child.tail, preserve)))
+    return f'<{element.tag}{attrs}>{"".join(inner)}</{element.tag}>'
+
+
+class PageSelection:
+    """Elements picked out of one page by PageFields, find(id=...) as on a BeautifulSoup tree"""
+
+    def __init__(self, nodes):
+        self.nodes = nodes
+
+    def find(self, id):
+        return self.nodes.get(id)
+
+
+class PageFields:
+    """
+    Element ids a county parser reads, compiled once into a single XPath query. select() runs
+    it over an lxml parse of the page instead of building a BeautifulSoup tree, ids absent from
+    the page find() as None. A page missing one of the required ids (say, after the site changed
+    its layout) is handed back as a full BeautifulSoup tree so the parser behaves as before.
+    """
+
+    def __init__(self, ids, required=()):
+        self.ids      = set(ids) | set(required)
+        self.required = set(required)
+        self.query    = _xpath('//*[' + ' or '.join(f'@id="{id}"' for id in sorted(self.ids)) + ']')
+
+    def select(self, html_text):
+        from lxml import etree
+        try: # through a TreeBuilder, which like BeautifulSoup gets '' for a bare <input disabled>, not 'disabled'
+            root = etree.fromstring(html_text, etree.HTMLParser(target=etree.TreeBuilder()))
+        except (ValueError, etree.XMLSyntaxError): # empty page, or an xml declaration lxml refuses in a str
+            root = None
+
+        nodes = {}
+        for element in (self.query(root) if root is not None else []):
+            nodes.setdefault(element.get('id'), PageNode(element))
+
+        if not self.required <= nodes.keys():
+            from bs4 import BeautifulSoup
+            return BeautifulSoup(html_text, 'lxml')
+        return PageSelection(nodes)
+
+
+class LabelScanner:
+    """
+    Index of the first line holding each of a fixed set of labels, found in a single pass over
+    the page with one compiled alternation, instead of one scan of the lines per label.
+    No label may be a substring of another or overlap it in the page.
+    """
+
+    def __init__(self, labels):
+        self.labels  = set(labels)
+        self.pattern = re.compile('|'.join(re.escape(label) for label in sorted(self.labels, key=len, reverse=True)))
+
+    def scan(self, text):
+        label_lines, line_idx, pos = {}, 0, 0
+        for match in self.pattern.finditer(text):
+            label = match.group(0)
+            if label not in label_lines:
+                line_idx          += text.count('\n', pos, match.start())
+                pos                = match.start()
+                label_lines[label] = line_idx
+                if len(label_lines)==len(self.labels):
+                    break
+
+        return label_lines
+
+
+class ParseCache:
+    """
+    Parser output for page contents already seen, in <ROOT_DIR>/data/parse_cache.sqlite, keyed by
+    county, parser version and page_key(page) (the content hash(es) the result is derived from).
+    Entries of other versions of the county's parser are dropped on opening, so bumping the
+    version of one parser re-parses only that county, and evict_unseen() after a run over all
+    of the county's pages drops the entries of contents no longer there.
+    """
+
+    def __init__(self, county, version, page_key):
+        self.county   = county
+        self.version  = version
+        self.page_key = page_key
+        self.seen     = set() # keys looked up since opening
+        self.db       = sqlite3.connect(f'{ROOT_DIR}/data/parse_cache.sqlite', timeout=60)
+
+        with self.db:
+            self.db.execute('CREATE TABLE IF NOT EXISTS parsed (county TEXT, version INTEGER, key TEXT, result TEXT, '
+                            'PRIMARY KEY (county, version, key))')
+            self.db.execute('DELETE FROM parsed WHERE county=? AND version!=?', (county, version))
+
+    def get_many(self, keys):
+        keys    = list(keys)
+        results = {}
+        self.seen.update(keys)
+        for start in range(0, len(keys), SQL_VARIABLES):
+            chunk = keys[start:start+SQL_VARIABLES]
+            query = f'SELECT key, result FROM parsed WHERE county=? AND version=? AND key IN ({", ".join("?"*len(chunk))})'
+            for key, result in self.db.execute(query, (self.county, self.version, *chunk)):
+                results[key] = json.loads(result)
+        return results
+
+    def put_many(self, items):
+        with self.db:
+            self.db.executemany('INSERT OR REPLACE INTO parsed VALUES (?, ?, ?, ?)',
+                                [(self.county, self.version, key, json.dumps(result)) for key, result in items])
+
+    def evict_unseen(self):
+        """Drops the county's entries not looked up since opening, returns how many"""
+        with self.db:
+            self.db.execute('CREATE TEMP TABLE IF NOT EXISTS seen (key TEXT PRIMARY KEY)')
+            self.db.execute('DELETE FROM seen')
+            self.db.executemany('INSERT OR IGNORE INTO seen VALUES (?)', [(key,) for key in self.seen])
+            return self.db.execute('DELETE FROM parsed WHERE county=? AND version=? AND key NOT IN (SELECT key FROM seen)',
+                                   (self.county, self.version)).rowcount
+
+    def close(self):
+        self.db.close()
+
+
+def _parse_safely(parse_func, page):
+    try:
+        return parse_func(page), None
+    except Exception as e:
+        return None, f'{type(e).__name__}: {e}'
+
+def parse_pages(parse_func, pages, workers=1, cache=None, stats=None):
+    """
+    Yields parse_func(page) for every page in the order of pages, spread over a pool of
+    workers processes. None results are dropped; a page that raises is reported to stderr
+    and skipped without losing the batch. parse_func must be a module level function.
+    With a ParseCache only pages whose content it hasn't seen are parsed.
+    Pages go through PARSE_BATCH at a time, so memory doesn't grow with the county.
+    Counts of parsed, cached and failed pages are added up in the stats dictionary.
+    """
+    stats    = stats if stats is not None else {}
+    for outcome in ['parsed', 'cached', 'failed']:
+        stats.setdefault(outcome, 0)
+    pages    = list(pages)
+    # forked workers inherit the parser state of the parent (see _parsing), whatever the platform default
+    executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('fork')) if workers>1 else None
+
+    try:
+        with tqdm(total=len(pages)) as progress:
+            for start in range(0, len(pages), PARSE_BATCH):
+                batch  = pages[start:start+PARSE_BATCH]
+                keys   = [cache.page_key(page) for page in batch] if cache is not None else [None]*len(batch)
+                cached = cache.get_many(keys) if cache is not None else {}
+                todo   = [page for page, key in zip(batch, keys) if key not in cached]
+
+                if executor is not None:
+                    results = executor.map(_parse_safely, itertools.repeat(parse_func), todo, chunksize=PARSE_CHUNK)
+                else:
+                    results = map(_parse_safely, itertools.repeat(parse_func), todo)
+
+                new_entries = []
+                try:
+                    for page, key in zip(batch, keys):
+                        progress.update()
+                        if key in cached:
+                            result           = cached[key]
+                            stats['cached'] += 1
+                        else:
+                            result, error = next(results)
+                            if error is not None:
+                                sys.stderr.write(f'Parsing {page} failed: {error}\n')
+                                stats['failed'] += 1
+                                continue
+                            new_entries.append((key, result))
+                            stats['parsed'] += 1
+
+                        if result is not None:
+                            yield result
+                finally:
+                    if cache is not None and new_entries:
+                        cache.put_many(new_entries)
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+
+
+def _arrow_type(type_name):
+    import pyarrow as pa
+    if type_name=='category':
+        return pa.dictionary(pa.int32(), pa.string())
+    if type_name.startswith('map<'):
+        return pa.map_(*[_arrow_type(name) for name in type_name[4:-1].split(', ')])
+    return pa.type_for_alias(type_name)
+
+def output_schema(columns):
+    import pyarrow as pa
+    return pa.schema([(column, _arrow_type(COLUMN_TYPES[column])) for column in columns])
+
+
+class RecordWriter:
+    """
+    Writes parser records as they are produced to <base_fname>.jsonl and <base_fname>.csv,
+    and to the <base_fname>.json array older readers expect when json_array is set. With columns,
+    also to <base_fname>.parquet with the output_schema() of those columns, PARQUET_ROWS records
+    at a time. Nothing else is held in memory but the CSV header. Files are written under .tmp
+    names and renamed on close(), so a run that fails or produces no records leaves the previous
+    output in place. Whole numbers in float64 columns are written as floats (0.0, not 0), as
+    pandas wrote them.
+    """
+
+    def __init__(self, base_fname, json_array=False, columns=None):
+        self.base_fname     = base_fname
+        self.formats        = ['jsonl', 'csv'] + (['json'] if json_array else [])
+        self.files          = {fmt: open(f'{base_fname}.{fmt}.tmp', 'w', newline='') for fmt in self.formats}
+        self.csv_writer     = None
+        self.columns        = columns
+        self.schema         = output_schema(columns) if columns else None
+        self.parquet_writer = None
+        self.rows           = {column: [] for column in columns or []}
+        self.count          = 0
+
+    def write(self, record):
+        record = {key: float(value) if type(value) is int and COLUMN_TYPES.get(key)=='float64' else value
+                  for key, value in record.items()}
+        line   = json.dumps(record)
+        self.files['jsonl'].write(f'{line}\n')
+
+        if 'json' in self.files:
+            self.files['json'].write(f', {line}' if self.count else f'[{line}')
+
+        if self.csv_writer is None:
+            self.csv_writer = csv.DictWriter(self.files['csv'], fieldnames=list(record), lineterminator='\n')
+            self.csv_writer.writeheader()
+        self.csv_writer.writerow(record)
+
+        if self.columns:
+            for column in self.columns:
+                self.rows[column].append(record[column])
+            if len(self.rows[self.columns[0]])>=PARQUET_ROWS:
+                self.flush_rows()
+
+        self.count += 1
+
+    def flush_rows(self):
+        import pyarrow as pa, pyarrow.parquet as pq
+        if self.parquet_writer is None:
+            self.parquet_writer = pq.ParquetWriter(f'{self.base_fname}.parquet.tmp', self.schema)
+        self.parquet_writer.write_table(pa.Table.from_pydict(self.rows, schema=self.schema))
+        self.rows = {column: [] for column in self.columns}
+
+    def close(self):
+        if 'json' in self.files and self.count:
+            self.files['json'].write(']')
+
+        fmts = list(self.files)
+        for f in self.files.values():
+            f.close()
+
+        if self.columns:
+            if self.count and self.rows[self.columns[0]]:
+                self.flush_rows()
+            if self.parquet_writer is not None:
+                self.parquet_writer.close()
+                fmts.append('parquet')
+
+        for fmt in fmts:
+            if self.count:
+                os.replace(f'{self.base_fname}.{fmt}.tmp', f'{self.base_fname}.{fmt}')
+            else:
+                os.remove(f'{self.base_fname}.{fmt}.tmp')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is not None:
+            self.count = 0 # keep the last complete output
+        self.close()
+
+
+def _pdf_text(fname):
+    """
+    ps2ascii text of a PDF, from <ROOT_DIR>/data/pdf_text/<sha1 of the PDF>.txt.gz when this
+    PDF was converted before. A failed conversion isn't cached, its partial output is returned.
+    """
+    digest = hashlib.sha1()
+    with open(fname, 'rb') as f:
+        for block in iter(lambda: f.read(2**20), b''):
+            digest.update(block)
+
+    text_dir   = f'{ROOT_DIR}/data/pdf_text'
+    text_fname = f'{text_dir}/{digest.hexdigest()}.txt.gz'
+    if os.path.exists(text_fname):
+        return text_fname
+
+    res = subprocess.run(['ps2ascii', fname], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if res.returncode!=0:
+        return res.stdout
+
+    os.makedirs(text_dir, exist_ok=True)
+    with gzip.open(f'{text_fname}.tmp', 'wb') as f:
+        f.write(res.stdout)
+    os.replace(f'{text_fname}.tmp', text_fname)
+    return text_fname
+
+def _text_lines(text):
+    with (io.BytesIO(text) if isinstance(text, bytes) else gzip.open(text, 'rb')) as f:
+        for line in f:
+            yield line.rstrip(b'\n').decode('utf-8').strip('\r')
+
+def pdf_text_lines(fnames, workers=PDF_WORKERS):
+    """
+    Yields (fname, iterator over the text lines of the PDF) for every PDF in fnames, in order.
+    The PDFs are converted by up to workers ps2ascii processes at once, and only once per content.
+    """
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for fname, text in zip(fnames, executor.map(_pdf_text, fnames)):
+            yield fname, _text_lines(text)
+
+
+def sorted_records(fname, key):
+    """
+    Records of a JSON Lines file in order of key (stable). Files over SORT_CHUNK records are
+    sorted a chunk at a time into temporary runs that are merged while reading, so memory
+    stays bounded whatever the size of the file.
+    """
+    with open(fname, 'r') as f, tempfile.TemporaryDirectory(dir=os.path.dirname(fname)) as tmp_dir:
+        runs = []
+        while True:
+            chunk = sorted((json.loads(line) for line in itertools.islice(f, SORT_CHUNK)), key=key)
+            if not chunk:
+                break
+            if not runs and len(chunk)<SORT_CHUNK: # fits in memory
+                yield from chunk
+                return
+
+            runs.append(f'{tmp_dir}/run_{len(runs):05d}.jsonl')
+            with open(runs[-1], 'w') as run:
+                run.writelines(f'{json.dumps(record)}\n' for record in chunk)
+
+        with contextlib.ExitStack() as stack:
+            run_files = [stack.enter_context(open(run, 'r')) for run in runs]
+            yield from heapq.merge(*[map(json.loads, run) for run in run_files], key=key)
+
+
+def read_records(fname):
+    """Records of a JSON Lines file, one at a time"""
+    with open(fname, 'r') as f:
+        for line in f:
+            yield json.loads(line)
+
+
+def _sql_type(type_name):
+    if type_name in ('int64', 'bool'):
+        return 'INTEGER'
+    return 'REAL' if type_name=='float64' else 'TEXT'
+
+def _sql_value(value):
+    return json.dumps(value) if isinstance(value, (dict, list)) else value
+
+
+class PropertyDB:
+    """
+    The final output of every county in <ROOT_DIR>/output/properties.sqlite: table properties with
+    one row per record, keyed by county, prop_id and seq (the position of the record among those of
+    its property), the columns of COLUMN_TYPES (flags as 0/1, land_dict as JSON) and an index on
+    each of DB_INDEXES. Every update() of a county gets the next version in table updates, and
+    the rows it added, removed or changed are logged in table changes under that version, with
+    fields {column: [old value, new value]} of the columns that differ, for delta(); the first
+    update of a county is the baseline the later ones are compared to and logs nothing. Table leads
+    holds the rows of each of the LEAD_VIEWS, and lead_views the condition and county version
+    it was last refreshed with. A readonly database is opened as it is, without setting up the
+    schema, for reading from any thread (one at a time).
+    """
+
+    def __init__(self, fname=None, readonly=False):
+        self.fname   = fname or f'{ROOT_DIR}/output/properties.sqlite'
+        self.columns = list(COLUMN_TYPES)
+        if readonly:
+            self.db             = sqlite3.connect(f'file:{self.fname}?mode=ro', uri=True, timeout=60, check_same_thread=False)
+            self.db.row_factory = sqlite3.Row
+            return
+
+        os.makedirs(os.path.dirname(self.fname), exist_ok=True)
+        self.db             = sqlite3.connect(self.fname, timeout=60)
+        self.db.row_factory = sqlite3.Row
+
+        columns = ', '.join(f'{column} {_sql_type(type_name)}' for column, type_name in COLUMN_TYPES.items())
+        with self.db:
+            self.db.execute(f'CREATE TABLE IF NOT EXISTS properties (county TEXT NOT NULL, seq INTEGER NOT NULL, {columns}, '
+                            'PRIMARY KEY (county, prop_id, seq))')
+            self.db.execute('CREATE TABLE IF NOT EXISTS updates (county TEXT, version INTEGER, updated TEXT, '
+                            'added INTEGER, removed INTEGER, changed INTEGER, PRIMARY KEY (county, version))')
+            self.db.execute(f'CREATE TABLE IF NOT EXISTS changes (county TEXT, version INTEGER, prop_id {_sql_type(COLUMN_TYPES["prop_id"])}, '
+                            'seq INTEGER, change TEXT, fields TEXT, PRIMARY KEY (county, version, prop_id, seq))')
+            self.db.execute('CREATE TABLE IF NOT EXISTS lead_views (view TEXT PRIMARY KEY, condition TEXT, version INTEGER)')
+            self.db.execute(f'CREATE TABLE IF NOT EXISTS leads (view TEXT, prop_id {_sql_type(COLUMN_TYPES["prop_id"])}, seq INTEGER, '
+                            'PRIMARY KEY (view, prop_id, seq))')
+            for column in DB_INDEXES:
+                self.db.execute(f'CREATE INDEX IF NOT EXISTS properties_{column} ON properties (county, {column})')
+
+    def version(self, county):
+        """Version of the last update of a county, 0 before the first one"""
+        return self.db.execute('SELECT COALESCE(MAX(version), 0) FROM updates WHERE county=?', (county,)).fetchone()[0]
+
+    def data_version(self):
+        """Last update version of every county, changing whenever any county is updated"""
+        return tuple(tuple(row) for row in self.db.execute('SELECT county, MAX(version) FROM updates GROUP BY county ORDER BY county'))
+
+    def version_at(self, county, timestamp):
+        """Version of a county as of timestamp (ISO format)"""
+        return self.db.execute('SELECT COALESCE(MAX(version), 0) FROM updates WHERE county=? AND updated<=?',
+                               (county, timestamp)).fetchone()[0]
+
+    def update(self, county, records, full=True, removed=()):
+        """
+        Upserts the records of a county, dropping the rows past the last record of each property
+        and the properties with prop_id in removed (deleted from the county website). With full,
+        the records are the whole county and the properties not among them are dropped too.
+        Returns the number of records, nothing changes if there are none and nothing is removed.
+        """
+        key     = 'staged.prop_id=properties.prop_id AND staged.seq=properties.seq'
+        gone    = (f'county=? AND NOT EXISTS (SELECT 1 FROM staged WHERE {key})'
+                   + ('' if full else ' AND (prop_id IN (SELECT prop_id FROM staged) OR prop_id IN (SELECT prop_id FROM dropped))'))
+        seqs    = {} # prop_id -> records seen
+        records = iter(records)
+
+        with self.db:
+            self.db.execute('CREATE TEMP TABLE IF NOT EXISTS staged AS SELECT * FROM properties WHERE 0')
+            self.db.execute('CREATE UNIQUE INDEX IF NOT EXISTS temp.staged_key ON staged (prop_id, seq)')
+            self.db.execute('DELETE FROM staged')
+            self.db.execute(f'CREATE TEMP TABLE IF NOT EXISTS dropped (prop_id {_sql_type(COLUMN_TYPES["prop_id"])} UNIQUE)')
+            self.db.execute('DELETE FROM dropped')
+            self.db.executemany('INSERT OR IGNORE INTO dropped VALUES (?)', [(prop_id,) for prop_id in removed])
+
+            insert = f'INSERT INTO staged (county, seq, {", ".join(self.columns)}) VALUES (?, ?, {", ".join("?"*len(self.columns))})'
+            while batch := list(itertools.islice(records, DB_BATCH)):
+                rows = []
+                for record in batch:
+                    prop_id       = record['prop_id']
+                    seqs[prop_id] = seqs.get(prop_id, 0)+1
+                    rows.append((county, seqs[prop_id]-1, *[_sql_value(record.get(column)) for column in self.columns]))
+                self.db.executemany(insert, rows)
+
+            if not seqs and not removed:
+                return 0
+
+            version = self.version(county)+1
+            changes = []
+            if version>1: # the first load of a county is its baseline, with nothing to compare to
+                for old in self.db.execute(f'SELECT * FROM properties WHERE {gone}', (county,)):
+                    changes.append((county, version, old['prop_id'], old['seq'], 'removed',
+                                    json.dumps({column: [old[column], None] for column in self.columns if old[column] is not None})))
+
+                for row in self.db.execute(f'SELECT staged.*, properties.county IS NOT NULL AS found, '
+                                           f'{", ".join(f"properties.{column} AS old_{column}" for column in self.columns)} '
+                                           f'FROM staged LEFT JOIN properties ON properties.county=? AND {key}', (county,)):
+                    fields = {column: [row[f'old_{column}'], row[column]] for column in self.columns
+                              if row[f'old_{column}']!=row[column]}
+                    if fields:
+                        changes.append((county, version, row['prop_id'], row['seq'], 'changed' if row['found'] else 'added',
+                                        json.dumps(fields)))
+
+            self.db.execute(f'DELETE FROM properties WHERE {gone}', (county,))
+            self.db.execute('INSERT OR REPLACE INTO properties SELECT * FROM staged')
+            self.db.executemany('INSERT INTO changes VALUES (?, ?, ?, ?, ?, ?)', changes)
+
+            counts = {change: sum(entry[4]==change for entry in changes) for change in ('added', 'removed', 'changed')}
+            self.db.execute('INSERT INTO updates VALUES (?, ?, ?, ?, ?, ?)',
+                            (county, version, datetime.datetime.now().isoformat(timespec='seconds'),
+                             counts['added'], counts['removed'], counts['changed']))
+
+        return sum(seqs.values())
+
+    def delta(self, county, since, until=None):
+        """
+        Net changes of a county's rows from version since to version until (the last one by
+        default), as (prop_id, seq, change, fields) sorted by prop_id and seq, change being
+        'added', 'removed' or 'changed' and fields as in table changes.
+        """
+        until = self.version(county) if until is None else until
+        rows  = self.db.execute('SELECT prop_id, seq, change, fields FROM changes WHERE county=? AND version>? AND version<=? '
+                                'ORDER BY prop_id, seq, version', (county, since, until))
+
+        for (prop_id, seq), entries in itertools.groupby(rows, key=itemgetter('prop_id', 'seq')):
+            entries = list(entries)
+            before  = entries[0]['change']!='added' # the row existed at version since
+            after   = entries[-1]['change']!='removed'
+            fields  = {}
+            for entry in entries:
+                for column, (old, new) in json.loads(entry['fields']).items():
+                    fields[column] = [fields.get(column, [old])[0], new]
+            fields = {column: values for column, values in fields.items() if values[0]!=values[1]}
+
+            if before and after and fields:
+                yield prop_id, seq, 'changed', fields
+            elif before!=after:
+                yield prop_id, seq, 'added' if after else 'removed', fields
+
+    def write_delta(self, county, since, fname, until=None):
+        """Writes delta() to a CSV with a line per changed field: prop_id, seq, change, field, old, new"""
+        with open(f'{fname}.tmp', 'w', newline='') as f:
+            writer = csv.writer(f, lineterminator='\n')
+            writer.writerow(['prop_id', 'seq', 'change', 'field', 'old', 'new'])
+            for prop_id, seq, change, fields in self.delta(county, since, until):
+                for field, (old, new) in fields.items():
+                    writer.writerow([prop_id, seq, change, field, old, new])
+        os.replace(f'{fname}.tmp', fname)
+
+    def refresh_leads(self, county):
+        """
+        Brings the LEAD_VIEWS of a county up to date, re-checking only the rows changed since
+        their last refresh, and rebuilds the views whose condition changed. Returns the names of
+        the views with rows added, removed or re-checked.
+        """
+        version = self.version(county)
+        touched = ('EXISTS (SELECT 1 FROM changes WHERE changes.county=? AND changes.version>? '
+                   'AND changes.prop_id={table}.prop_id AND changes.seq={table}.seq)')
+        views   = []
+
+        with self.db:
+            for name, (view_county, condition, order) in LEAD_VIEWS.items():
+                saved = self.db.execute('SELECT condition, version FROM lead_views WHERE view=?', (name,)).fetchone()
+                if view_county!=county or (saved is not None and saved['version']==version and saved['condition']==condition):
+                    continue
+
+                if saved is None or saved['condition']!=condition:
+                    self.db.execute('DELETE FROM leads WHERE view=?', (name,))
+                    self.db.execute(f'INSERT INTO leads SELECT ?, prop_id, seq FROM properties WHERE county=? AND ({condition})',
+                                    (name, county))
+                    views.append(name)
+                else:
+                    removed = self.db.execute(f'DELETE FROM leads WHERE view=? AND {touched.format(table="leads")}',
+                                              (name, county, saved['version'])).rowcount
+                    added   = self.db.execute(f'INSERT INTO leads SELECT ?, prop_id, seq FROM properties '
+                                              f'WHERE county=? AND {touched.format(table="properties")} AND ({condition})',
+                                              (name, county, county, saved['version'])).rowcount
+                    if removed or added:
+                        views.append(name)
+
+                self.db.execute('INSERT OR REPLACE INTO lead_views VALUES (?, ?, ?)', (name, condition, version))
+
+        return views
+
+    def lead_records(self, name):
+        """Records of a lead view in its mailing order"""
+        county, condition, order = LEAD_VIEWS[name]
+        rows = self.db.execute(f'SELECT * FROM properties WHERE county=? AND EXISTS (SELECT 1 FROM leads WHERE view=? '
+                               f'AND leads.prop_id=properties.prop_id AND leads.seq=properties.seq) ORDER BY {order}, prop_id, seq',
+                               (county, name))
+        for row in rows:
+            yield dict(row)
+
+    def query(self, sql, params=()):
+        """Rows of a query as dicts"""
+        return [dict(row) for row in self.db.execute(sql, params)]
+
+    def close(self):
+        self.db.close()
+
+
+def split_address(address):
+    """Street, town, state and 5-digit ZIP of a 'street, town, ST ZIP' address, ValueError if it isn't one"""
+    *street, town, area = address.split(',')
+    state, zip_code     = area.split()
+    return ','.join(street).strip(), town.strip(), state.strip(), zip_code.strip()[:5]
+
+def mailing_list(records):
+    """
+    Click2Mail rows (Name, Address, City, State, Zip) of the records with a usable owner address,
+    the first one of every owner name, leaving out the BAD_OWNERS
+    """
+    names = set()
+    for record in records:
+        try:
+            address = split_address(record['owner_address'])
+        except (ValueError, AttributeError):
+            continue
+
+        name = record['owner_name'] or ''
+        name = name[:-2] if name.endswith(' &') else name
+        if not name or name in names or any(owner.lower() in name.lower() for owner in BAD_OWNERS):
+            continue
+
+        names.add(name)
+        yield dict(zip(['Name', 'Address', 'City', 'State', 'Zip'], [name, *address]))
+
+def write_leads(db, name):
+    """Writes the mailing_list() of a lead view to <ROOT_DIR>/output/leads/<name>.csv"""
+    fname = f'{ROOT_DIR}/output/leads/{name}.csv'
+    os.makedirs(os.path.dirname(fname), exist_ok=True)
+    with open(f'{fname}.tmp', 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=['Name', 'Address', 'City', 'State', 'Zip'], lineterminator='\n')
+        writer.writeheader()
+        writer.writerows(mailing_list(db.lead_records(name)))
+    os.replace(f'{fname}.tmp', fname)
+
+
+def update_property_db(county, fname, full=True, removed=()):
+    """
+    Loads a county's JSON Lines output (none if fname is None) into the PropertyDB, see
+    PropertyDB.update(), writes the changes of the last DELTA_DAYS to output_<county>_delta.csv,
+    published with the CSV, and rewrites the mailing lists of the LEAD_VIEWS that changed.
+    """
+    with contextlib.closing(PropertyDB()) as db:
+        version = db.version(county)
+        count   = db.update(county, read_records(fname) if fname else [], full=full, removed=removed)
+        if db.version(county)!=version:
+            week_ago    = (datetime.datetime.now()-datetime.timedelta(days=DELTA_DAYS)).isoformat(timespec='seconds')
+            delta_fname = f'{ROOT_DIR}/output/output_{county}/output_{county}_delta.csv'
+            db.write_delta(county, db.version_at(county, week_ago), delta_fname)
+            publish_csv(delta_fname, county, suffix='_delta')
+
+        missing = [name for name in LEAD_VIEWS if not os.path.exists(f'{ROOT_DIR}/output/leads/{name}.csv')]
+        for name in set(db.refresh_leads(county)) | {name for name in missing if LEAD_VIEWS[name][0]==county}:
+            write_leads(db, name)
+        return count
+
+
+class CountyAdapter:
+    """
+    What the shared drivers need to know about one county website, every part optional.
+    For run_fetcher(): page_urls {page name: url}, both formats of {prop_id}, the first being
+    the property's main page; not_found(response) recognizing a deleted property; the cookie_url
+    of the search site, the default id_ranges and the notebook_ranges fetched when run from a
+    notebook (the first 100 IDs unless given). For run_parser(): parse(html_text, *related)
+    giving the record of a page (a list of them with many=True) or None, for the pages matching
+    pattern; related(page) naming the other pages a record draws on, passed as their text or
+    None; the output columns; the parser version for the ParseCache; key_salt() for records
+    that depend on more than their pages; postprocess(record) run after the cache; and whether
+    this is the county's final output, published on the web server and loaded into the
+    PropertyDB. name tells apart several outputs of one county.
+    """
+
+    def __init__(self, county, name=None, page_urls=None, not_found=None, cookie_url=None, id_ranges=None,
+                 notebook_ranges=None, http_attempts=1000, parse=None, pattern='*', related=None, columns=None, version=1,
+                 key_salt=None, many=False, postprocess=None, publish=True):
+        self.county          = county
+        self.name            = name or county
+        self.page_urls       = page_urls or {}
+        self.not_found       = not_found
+        self.cookie_url      = cookie_url
+        self.id_ranges       = id_ranges
+        self.notebook_ranges = notebook_ranges or (id_ranges and [(id_ranges[0][0], id_ranges[0][0]+100)])
+        self.http_attempts   = http_attempts
+        self.parse           = parse
+        self.pattern         = pattern
+        self.related         = related or (lambda page: [])
+        self.columns         = columns
+        self.version         = version
+        self.key_salt        = key_salt
+        self.many            = many
+        self.postprocess     = postprocess
+        self.publish         = publish
+
+    def data_dir(self):
+        return f'{ROOT_DIR}/data/data_{self.county}'
+
+    def output_dir(self):
+        return f'{ROOT_DIR}/output/output_{self.county}'
+
+
+def _write_atomically(fname, write_func):
+    """Writes fname with write_func(binary file) under a hidden temporary name and renames it into place"""
+    tmp_fname = f'{os.path.dirname(fname)}/.{os.path.basename(fname)}.tmp'
+    with open(tmp_fname, 'wb') as f:
+        write_func(f)
+    os.replace(tmp_fname, fname)
+
+def _file_sha256(fname):
+    digest = hashlib.sha256()
+    with open(fname, 'rb') as f:
+        for block in iter(lambda: f.read(2**20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def publish_csv(fname, county, suffix=''):
+    """
+    Publishes the finished CSV of a county on the website as output_<county><suffix>.csv when
+    running on the AWS host, unless its content is what was published last time. Next to it go
+    a .gz copy and a .sha256 file of its content hash, written last; the main CSV of a county
+    also gets its SAMPLE_LINES sample, and output_all.zip is rebuilt from all CSVs. Every file
+    is renamed into place once complete, so downloads never see a partial one. Returns whether
+    anything was published.
+    """
+    if not re.match(r'ip\-\d+\-\d+\-\d+\-\d+\..*', platform.node()):
+        return False
+
+    output_dir = f'{WWW_DIR}/output'
+    name       = f'output_{county}{suffix}.csv'
+    digest     = _file_sha256(fname)
+    hash_fname = f'{output_dir}/{name}.sha256'
+    os.makedirs(output_dir, exist_ok=True)
+
+    if os.path.exists(hash_fname) and os.path.exists(f'{output_dir}/{name}'):
+        with open(hash_fname, 'r') as f:
+            if f.read().split()[:1]==[digest]:
+                return False
+
+    def write_copy(f):
+        with open(fname, 'rb') as src:
+            shutil.copyfileobj(src, f)
+
+    def write_gzip(f):
+        with open(fname, 'rb') as src, gzip.GzipFile(filename=name, mode='wb', fileobj=f, mtime=0) as gz_f:
+            shutil.copyfileobj(src, gz_f)
+
+    def write_sample(f):
+        with open(fname, 'rb') as src:
+            f.writelines(itertools.islice(src, SAMPLE_LINES))
+
+    def write_zip(f):
+        with zipfile.ZipFile(f, 'w', zipfile.ZIP_DEFLATED) as zip_f:
+            for csv_fname in sorted(glob.glob(f'{output_dir}/*.csv')):
+                zip_f.write(csv_fname, arcname=os.path.basename(csv_fname))
+
+    # parsers of other counties may publish at once; flock dies with its process, and stays out of the web root
+    os.makedirs(f'{ROOT_DIR}/output', exist_ok=True)
+    with open(f'{ROOT_DIR}/output/publish.lock', 'a') as lock_f:
+        fcntl.flock(lock_f, fcntl.LOCK_EX)
+        _write_atomically(f'{output_dir}/{name}', write_copy)
+        _write_atomically(f'{output_dir}/{name}.gz', write_gzip)
+        if not suffix:
+            os.makedirs(f'{WWW_DIR}/assets/samples', exist_ok=True)
+            _write_atomically(f'{WWW_DIR}/assets/samples/sample_{county}.csv', write_sample)
+        _write_atomically(f'{output_dir}/output_all.zip', write_zip)
+        _write_atomically(hash_fname, lambda f: f.write(f'{digest}  {name}\n'.encode()))
+
+    return True
+
+
+def _fetch_property(adapter, session, manifest, prop_id):
+    outcomes = []
+    for page_format, url_format in adapter.page_urls.items():
+        page     = page_format.format(prop_id=prop_id)
+        url      = url_format.format(prop_id=prop_id)
+        response = session.get(url, attempts=adapter.http_attempts, headers=manifest.conditional_headers(page))
+
+        if manifest.not_modified(page, response):
+            outcomes.append('unchanged')
+        elif adapter.not_found(response):
+            manifest.remove_page(page)
+            outcomes.append('removed')
+        else:
+            outcomes.append('saved' if manifest.write_page(page, response) else 'unchanged')
+
+    # a property lives as long as its main page does
+    return 'saved' if 'saved' in outcomes and outcomes[0]!='removed' else outcomes[0]
+
+def run_fetcher(adapter):
+    """Command line fetcher of the pages of adapter.page_urls for every planned property ID"""
+    data_dir = adapter.data_dir()
+    os.makedirs(data_dir, exist_ok=True)
+
+    if isnotebook():
+        id_ranges                        = adapter.notebook_ranges
+        in_flight, full, explore, resume = None, False, EXPLORE_FRACTION, False
+    else:
+        parser = argparse.ArgumentParser(description='Fetcher range')
+        parser.add_argument('-begin_id', type=int, help='starting id (default: all known ranges)', required=False, default=None)
+        parser.add_argument('-end_id', type=int, help='ending id (default: all known ranges)', required=False, default=None)
+        parser.add_argument('-in_flight', type=int, help='max simultaneous requests to the county host', required=False, default=None)
+        parser.add_argument('-full', help='probe every ID in the range instead of the known-ID plan', dest='full', action='store_true', required=False)
+        parser.add_argument('-explore', type=float, help='share of unknown IDs probed per crawl', required=False, default=EXPLORE_FRACTION)
+        parser.add_argument('--resume', help='continue the interrupted run from its journal', dest='resume', action='store_true', required=False)
+        parser.set_defaults(full=False, resume=False)
+        args = parser.parse_args()
+        in_flight, full, explore, resume = args.in_flight, args.full, args.explore, args.resume
+        if args.begin_id is None and args.end_id is None:
+            id_ranges = adapter.id_ranges
+        else:
+            begin_id  = args.begin_id if args.begin_id is not None else adapter.id_ranges[0][0]
+            end_id    = args.end_id if args.end_id is not None else adapter.id_ranges[-1][1]
+            id_ranges = [(begin_id, end_id)]
+
+    main_url = next(iter(adapter.page_urls.values()))
+    id_index = IdIndex(data_dir)
+    prop_ids = itertools.chain.from_iterable(range(*id_range) for id_range in id_ranges) if full else id_index.plan(id_ranges, explore)
+    session  = CountySession(adapter.cookie_url or main_url, pool_size=in_flight)
+    manifest = PageManifest(data_dir, resume=resume)
+    fetch    = functools.partial(_fetch_property, adapter, session, manifest)
+
+    with FetchJournal(data_dir, resume=resume) as journal:
+        manifest.recover([page_format.format(prop_id=prop_id) for prop_id in journal.completed for page_format in adapter.page_urls])
+        try:
+            outcomes = fetch_concurrently(fetch, journal.pending(prop_ids), main_url, in_flight=in_flight, journal=journal)
+        finally:
+            manifest.save()
+
+    id_index.update({**journal.completed, **outcomes}, id_ranges)
+    id_index.save()
+    SnapshotStore(adapter.county).record(manifest.store, hashes=manifest.hashes())
+
+
+def parser_arguments(description='What to parse'):
+    """ArgumentParser with the options every parser script understands, for run_parser()"""
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument('--changed_only', help='parse only pages changed by the last fetch', dest='changed_only', action='store_true', required=False)
+    parser.add_argument('-snapshot', help='re-parse the pages of a past crawl (YYYY-MM-DD)', required=False, default=None)
+    parser.add_argument('-workers', type=int, help='number of parser processes', required=False, default=1)
+    parser.add_argument('--no_cache', help='re-parse every page, ignoring the parse cache', dest='no_cache', action='store_true', required=False)
+    parser.set_defaults(changed_only=False, no_cache=False)
+    return parser
+
+PARSER_DEFAULTS = parser_arguments().parse_args([])
+
+def output_base(adapter, args=None):
+    args        = args or PARSER_DEFAULTS
+    output_sffx = f'_{args.snapshot}' if args.snapshot else '_changed' if args.changed_only else ''
+    return f'{adapter.output_dir()}/output_{adapter.name}{output_sffx}'
+
+def remove_changed_outputs(adapter, args):
+    """
+    Drops the outputs of the previous --changed_only run before a new one, which leaves none if
+    no page changed, so that they are never taken for this run's records
+    """
+    base_fname = output_base(adapter, args)
+    if args.changed_only and not args.snapshot:
+        for fmt in ['jsonl', 'csv', 'json', 'parquet']:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(f'{base_fname}.{fmt}')
+
+def removed_ids(adapter, args=None):
+    """
+    IDs of the pages matching adapter.pattern that the last fetch removed, for a --changed_only
+    run of a parser, otherwise none
+    """
+    args    = args or PARSER_DEFAULTS
+    changed = changed_pages(adapter.data_dir()) if args.changed_only and not args.snapshot else None
+    if not changed:
+        return set()
+    store = PageStore(adapter.data_dir())
+    return {page_id(page) for page in fnmatch.filter(changed, adapter.pattern) if not store.exists(page)}
+
+
+# adapter and store of the running parser, inherited by the forked worker processes
+_parsing = {}
+
+def _parse_county_page(page):
+    adapter, store = _parsing['adapter'], _parsing['store']
+    related        = [store.read(name) if store.exists(name) else None for name in adapter.related(page)]
+    return adapter.parse(store.read(page), *related)
+
+def run_parser(adapter, args=None):
+    """
+    Parses the pages of a county into <output_base>.jsonl/.csv/.json (and .parquet with columns),
+    from the current crawl or the args.snapshot, the pages changed by the last fetch only with
+    args.changed_only, whose records are then upserted into the PropertyDB. Returns the number
+    of records written. Too many pages failing to parse raise RuntimeError, leaving the last
+    output in place.
+    """
+    args       = args or PARSER_DEFAULTS
+    data_dir   = adapter.data_dir()
+    start_time = time.time()
+    os.makedirs(adapter.output_dir(), exist_ok=True)
+
+    store   = SnapshotStore(adapter.county).snapshot(args.snapshot) if args.snapshot else PageStore(data_dir)
+    pages   = store.pages(adapter.pattern)
+    changed = changed_pages(data_dir) if args.changed_only and not args.snapshot else None
+    if changed is not None: # a record is re-parsed if any of its pages changed
+        pages = [page for page in pages if {page, *adapter.related(page)} & changed]
+
+    def page_key(page):
+        hashes = [store.content_hash(name) if store.exists(name) else '' for name in [page, *adapter.related(page)]]
+        salt   = [adapter.key_salt()] if adapter.key_salt else []
+        return ':'.join(hashes+salt)
+
+    _parsing.update(adapter=adapter, store=store)
+    cache = ParseCache(adapter.name, adapter.version, page_key) if not args.no_cache else None
+    stats = {}
+
+    remove_changed_outputs(adapter, args)
+    with RecordWriter(output_base(adapter, args), json_array=True, columns=adapter.columns) as writer:
+        for result in parse_pages(_parse_county_page, pages, workers=args.workers, cache=cache, stats=stats):
+            for record in (result if adapter.many else [result]):
+                writer.write(adapter.postprocess(record) if adapter.postprocess else record)
+
+        if stats['failed']>max(PARSE_FAILURES, PARSE_FAIL_SHARE*len(pages)): # e.g. the website layout changed
+            raise RuntimeError(f"{adapter.name}: {stats['failed']} of {len(pages)} pages failed to parse, "
+                               f"keeping the last output, database and published CSV")
+
+    sys.stderr.write(f"{adapter.name}: {writer.count} records from {len(pages)} pages ({stats['parsed']} parsed, "
+                     f"{stats['cached']} cached, {stats['failed']} failed) in {time.time()-start_time:.0f} sec\n")
+
+    main_output = output_base(adapter, args)==output_base(adapter) # not a snapshot or changed pages only
+    if cache is not None:
+        if main_output: # every current page was looked up, the rest of the cache is stale
+            cache.evict_unseen()
+        cache.close()
+    removed     = removed_ids(adapter, args)
+    if (writer.count or removed) and adapter.publish and not args.snapshot:
+        update_property_db(adapter.county, f'{output_base(adapter, args)}.jsonl' if writer.count else None,
+                           full=main_output, removed=removed)
+    if writer.count and adapter.publish and main_output:
+        publish_csv(f'{output_base(adapter)}.csv', adapter.county)
+
+    return writer.count
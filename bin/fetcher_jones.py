@@ -1,17 +1,17 @@
 #!/usr/bin/python3
 
-import os, time, requests, datetime, contextlib, argparse, sys, glob
+import os, requests, contextlib, argparse, sys, html
 import regex as re
 import pandas as pd
 import numpy as np
 import pickle as pkl
 from selenium import webdriver
 from selenium.webdriver.chrome.options import Options
-from selenium.common.exceptions import NoSuchElementException
+from selenium.common.exceptions import NoSuchElementException, TimeoutException
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.common.by import By
-from cad_lib import isnotebook, ROOT_DIR, FileLock, Timeout, WebDriver
+from cad_lib import isnotebook, ROOT_DIR, FileLock, SnapshotStore, CountySession, BrowserPool, SessionIdPool, FetchError, PageManifest, FetchJournal, fetch_concurrently
 
 HTTP_ATTEMPTS  = 50     #Number of attempts to reconnect to the server
 HTTP_TIMEOUT   = 10*60   #There are 5min+ delays observed with the county website
@@ -19,11 +19,10 @@ CNTY_SFFX      = 'jones' #County name
 OWNER_ID_SPLIT = 60000   #IDs above this are extracted from appraisal rolls
 PROP_ID_SPLIT  = 60000   #IDs above this are extracted from appraisal rolls
 WEBDRIVER_WAIT = 2       #Waiting time for an element (in sec), selenium webdriver
-
-if isnotebook():
-    from tqdm.notebook import tqdm, trange
-else:
-    from tqdm import tqdm, trange
+LOOKUP_WORKERS = 4       #Owner names resolved simultaneously
+SESSION_POOL   = 8       #Pre-warmed session IDs shared by the fetch workers
+BROWSER_TRIES  = 10      #Fresh browser attempts per owner name once the plain HTTP search fails
+SEARCH_URL     = 'http://www.jonescad.org/search.aspx?clientid=jonescad'
 
 def generate_session_id(url='http://www.jonescad.org/search.aspx?clientid=jonescad'):
     request_res  = requests.get(url)
@@ -48,9 +47,7 @@ def jones_import_ids(fname):
 
 def owner_name_to_ids(owner_name, driver=None):
     if driver is None:
-        options = Options()
-        options.headless = True
-        driver = webdriver.Chrome(options=options)
+        driver = headless_chrome()
 
     session_id = generate_session_id()
     driver.get(f'http://jonescad.org/{session_id}/search.aspx?clientid=jonescad')
@@ -68,27 +65,113 @@ def owner_name_to_ids(owner_name, driver=None):
         
     return owner_ids
 
-def extract_missing_owners(fname):
+def form_fields(html_text):
+    # hidden ASP.NET form state: __VIEWSTATE, __EVENTVALIDATION, ...
+    fields = {}
+    for tag in re.findall(r'<input[^>]*type="hidden"[^>]*>', html_text):
+        name  = re.search(r'name="([^"]*)"', tag)
+        value = re.search(r'value="([^"]*)"', tag)
+        if name:
+            fields[name[1]] = html.unescape(value[1]) if value else ''
+    return fields
+
+def find_input(html_text, name, value=None):
+    for tag in re.findall(r'<input[^>]*>', html_text):
+        if f'name="{name}"' in tag and (value is None or f'value="{value}"' in tag):
+            return tag
+    return ''
+
+def owner_name_to_ids_http(owner_name, session, session_id):
+    # same clicks as owner_name_to_ids, replayed as form posts; LookupError if the page does not play along
+    url       = f'http://www.jonescad.org/{session_id}/search.aspx?clientid=jonescad'
+    html_text = session.get(url).text
+    choices   = {}
+
+    for name, value in [('radSearch', 'radPropTax'), ('radPanelChoice', 'radOwnerName')]:
+        tag = find_input(html_text, name, value)
+        if not tag:
+            raise LookupError(f'No {name}={value} option in the search form')
+
+        choices[name] = value
+        postback      = re.search(r"__doPostBack\(\\?'([^'\\]*)", html.unescape(tag))
+        if postback: # AutoPostBack radio button, the server re-renders the form
+            data      = {**form_fields(html_text), **choices, '__EVENTTARGET': postback[1], '__EVENTARGUMENT': ''}
+            html_text = session.post(url, data).text
+
+    button = re.search(r'value="([^"]*)"', find_input(html_text, 'btnSearch'))
+    data   = {**form_fields(html_text), **choices, 'txtUserInput': owner_name, 'btnSearch': button[1] if button else 'Search'}
+    result = session.post(url, data).text
+
+    if 'no results' in result:
+        return []
+
+    owner_instances = re.findall('Owner=\d+', result)
+    if not owner_instances:
+        raise LookupError(f'Unexpected search result for {owner_name}')
+
+    return [int(line.split('=')[1]) for line in owner_instances]
+
+def jones_get(session, session_ids, url_path, stale=None):
+    # every attempt runs under its own pooled session ID, a failed ID is retired;
+    # the FetchError of a pool that runs dry goes to the journal as a failed ID
+    for trial in range(HTTP_ATTEMPTS):
+        session_id = session_ids.acquire()
+        response   = None
+
+        with contextlib.suppress(FetchError): # unhealthy response after CountySession's backoff
+            response = session.get(f'http://www.jonescad.org/{session_id}/{url_path}', stale=stale)
+
+        session_ids.release(session_id, healthy=response is not None)
+
+        if response is not None:
+            return response
+
+    raise FetchError(f'Connection timeout at {url_path}')
+
+def session_expired(response):
+    return 'Welcome to the P&amp;A Website!' in response.text
+
+def lookup_owner_ids(owner_name, session, session_ids, browsers):
+    try:
+        session_id = session_ids.acquire()
+    except FetchError: # no sessions to be had, the browser may still get through
+        session_id = None
+
+    if session_id is not None:
+        healthy = True
+        try:
+            return owner_name_to_ids_http(owner_name, session, session_id)
+        except LookupError:
+            pass
+        except Exception: # the website did not answer under this session, the browser may still get through
+            healthy = False
+        finally:
+            session_ids.release(session_id, healthy)
+
+    # Low level solution for unstable county website...
+    for trial in range(BROWSER_TRIES):
+        with contextlib.suppress(IndexError, NoSuchElementException, TimeoutException):
+            with browsers.driver() as driver:
+                return owner_name_to_ids(owner_name, driver)
+
+    sys.stderr.write(f'Could not resolve owner {owner_name}\n')
+    return []
+
+def headless_chrome():
+    options          = Options()
+    options.headless = True
+    return webdriver.Chrome(options=options)
+
+def extract_missing_owners(fname, session, session_ids, workers=LOOKUP_WORKERS):
     if os.path.exists(fname):
         with open(fname, 'rb') as f:
             owner_names = pkl.load(f)
-            
-        options          = Options()
-        options.headless = True
-        driver           = webdriver.Chrome(options=options)
-        i, extra_ids     = 0, []
-        owner_list_len   = len(owner_names)
-
-        # Low level solution for unstable county website...
-        while i<owner_list_len:
-            with WebDriver(webdriver.Chrome(options=options)) as driver:
-                with contextlib.suppress(IndexError, NoSuchElementException):
-                    while i<owner_list_len:
-                        owner_name = owner_names[i]
-                        ids        = owner_name_to_ids(owner_name, driver)
-                        extra_ids.extend(ids)
-                        i += 1
-        
+
+        with BrowserPool(headless_chrome, workers) as browsers:
+            lookup    = lambda owner_name: lookup_owner_ids(owner_name, session, session_ids, browsers)
+            owner_ids = fetch_concurrently(lookup, owner_names, SEARCH_URL, in_flight=workers)
+
+        extra_ids  = [owner_id for ids in owner_ids.values() for owner_id in ids]
         result_ids = np.unique(extra_ids)
     else:
         result_ids = []
@@ -96,17 +179,40 @@ def extract_missing_owners(fname):
     return result_ids
 
 
+def fetch_owner(owner_id):
+    page     = f'owner_{owner_id:08d}'
+    response = jones_get(session, session_ids, f'ptaxowner.aspx?ID=Pay&Owner={owner_id}&prop=R', stale=session_expired)
+
+    if fr'value="{owner_id}"' not in response.text: # owner was removed from the county website
+        manifest.remove_page(page)
+        return 'removed'
+
+    return 'saved' if manifest.write_page(page, response) else 'unchanged'
+
+def fetch_prop(prop_id):
+    page     = f'prop_{prop_id:06d}'
+    response = jones_get(session, session_ids, f'rgeneral.aspx?ID={prop_id}&seq=1', stale=session_expired)
+
+    if fr'value="{prop_id}"' not in response.text: # property was removed from the county website
+        manifest.remove_page(page)
+        return 'removed'
+
+    return 'saved' if manifest.write_page(page, response) else 'unchanged'
+
+
 if __name__ == '__main__':
 
     if isnotebook():
-        fetch_properties, fetch_owners = False, True
+        fetch_properties, fetch_owners, in_flight, resume = False, True, None, False
     else:
         parser = argparse.ArgumentParser(description='What to fetch')
         parser.add_argument('--properties', help='fetch properties', dest='properties', action='store_true', required=False)
         parser.add_argument('--owners', help='fetch owners', dest='owners', action='store_true', required=False)
-        parser.set_defaults(owners=False, properties=False)
+        parser.add_argument('-in_flight', type=int, help='max simultaneous requests to the county host', required=False, default=None)
+        parser.add_argument('--resume', help='continue the interrupted run from its journal', dest='resume', action='store_true', required=False)
+        parser.set_defaults(owners=False, properties=False, resume=False)
         args   = parser.parse_args()
-        fetch_properties, fetch_owners = args.properties, args.owners
+        fetch_properties, fetch_owners, in_flight, resume = args.properties, args.owners, args.in_flight, args.resume
     
     data_dir   = f'{ROOT_DIR}/data/data_{CNTY_SFFX}'
     output_dir = f'{ROOT_DIR}/output/output_{CNTY_SFFX}'
@@ -131,69 +237,38 @@ if __name__ == '__main__':
             f.write(response.content)
             
     owner_ids, property_ids = jones_import_ids(fname)
-    session_id              = generate_session_id()
+    session                 = CountySession(SEARCH_URL, pool_size=in_flight, timeout=HTTP_TIMEOUT)
+    session_ids             = SessionIdPool(generate_session_id, max(SESSION_POOL, in_flight or 0), attempts=HTTP_ATTEMPTS, timeout=HTTP_TIMEOUT)
+    loop_pages              = [pattern for pattern, fetch in [('owner_*', fetch_owners), ('prop_*', fetch_properties)] if fetch]
+    manifest                = PageManifest(data_dir, resume=resume, patterns=loop_pages)
 
     if fetch_owners: 
         begin_id, end_id = 1, OWNER_ID_SPLIT
         standard_ids     = np.arange(begin_id, end_id)
-        existing_fnames  = glob.glob(f'{ROOT_DIR}/data/data_{CNTY_SFFX}/owner*')
-        existing_ids     = [int(fname.split('/')[-1].replace('owner_', '').replace('.html', '')) for fname in existing_fnames]
+        existing_ids     = [int(page.replace('owner_', '')) for page in manifest.store.pages('owner_*')]
         special_ids      = owner_ids[owner_ids>=OWNER_ID_SPLIT]
-        missing_ids      = extract_missing_owners(f'{output_dir}/missing_owners.pkl')
+        missing_ids      = extract_missing_owners(f'{output_dir}/missing_owners.pkl', session, session_ids)
         all_owner_ids    = np.concatenate((standard_ids, existing_ids, special_ids, missing_ids))
-        all_owner_ids    = np.array(np.unique(all_owner_ids), dtype=np.int32)
-        
-        for owner_id in tqdm(all_owner_ids):
-            fname = f'{data_dir}/owner_{owner_id:08d}.html'
-
-            for trial in range(HTTP_ATTEMPTS):
-                with contextlib.suppress(ConnectionResetError):
-                    with Timeout(HTTP_TIMEOUT):
-                        url      = f'http://www.jonescad.org/{session_id}/ptaxowner.aspx?ID=Pay&Owner={owner_id}&prop=R'
-                        response = requests.get(url)
-
-                        if response.ok and 'Welcome to the P&amp;A Website!' not in response.text:
-                            break
-
-                if trial==HTTP_ATTEMPTS-1:
-                    raise Exception(f'Connection timeout at owner_id={owner_id}')
-
-                time.sleep(1)
-                session_id = generate_session_id()
-
-            if fr'value="{owner_id}"' not in response.text:
-                with contextlib.suppress(FileNotFoundError): # delete file, if owner was removed from the county website
-                    os.remove(fname)
-            else:
-                with open(fname, 'wb') as f:
-                    f.write(response.content)
+        all_owner_ids    = np.array(np.unique(all_owner_ids), dtype=np.int32).tolist()
+
+        with FetchJournal(data_dir, resume=resume, name='journal_owners') as journal:
+            manifest.recover([f'owner_{owner_id:08d}' for owner_id in journal.completed])
+            try:
+                fetch_concurrently(fetch_owner, journal.pending(all_owner_ids), SEARCH_URL, in_flight=in_flight, journal=journal)
+            finally:
+                manifest.save()
     
     if fetch_properties:
         begin_id, end_id = 10000, PROP_ID_SPLIT
         special_ids      = property_ids[property_ids>=PROP_ID_SPLIT]
-        all_prop_ids     = np.concatenate((np.arange(begin_id, end_id), special_ids))
-        
-        for prop_id in tqdm(all_prop_ids):
-            fname = f'{data_dir}/prop_{prop_id:06d}.html'
-
-            for trial in range(HTTP_ATTEMPTS):
-                with contextlib.suppress(ConnectionResetError):
-                    with Timeout(HTTP_TIMEOUT):
-                        url      = f'http://www.jonescad.org/{session_id}/rgeneral.aspx?ID={prop_id}&seq=1'
-                        response = requests.get(url)
-
-                        if response.ok and 'Welcome to the P&amp;A Website!' not in response.text:
-                            break
-
-                if trial==HTTP_ATTEMPTS-1:
-                    raise Exception(f'Connection timeout at prop_id={prop_id}')
-
-                time.sleep(1)
-                session_id = generate_session_id()
-
-            if fr'value="{prop_id}"' not in response.text:
-                with contextlib.suppress(FileNotFoundError): # delete file, if property was removed from the county website
-                    os.remove(fname)
-            else:
-                with open(fname, 'wb') as f:
-                    f.write(response.content)
+        all_prop_ids     = np.concatenate((np.arange(begin_id, end_id), special_ids)).tolist()
+
+        with FetchJournal(data_dir, resume=resume, name='journal_properties') as journal:
+            manifest.recover([f'prop_{prop_id:06d}' for prop_id in journal.completed])
+            try:
+                fetch_concurrently(fetch_prop, journal.pending(all_prop_ids), SEARCH_URL, in_flight=in_flight, journal=journal)
+            finally:
+                manifest.save()
+
+    session_ids.close()
+    SnapshotStore(CNTY_SFFX).record(manifest.store, hashes=manifest.hashes())
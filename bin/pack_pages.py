@@ -0,0 +1,39 @@
+#!/usr/bin/python3
+
+import os, glob, argparse
+from cad_lib import isnotebook, ROOT_DIR, PageArchive, compact_archive
+
+COUNTIES = ['taylor', 'callahan', 'tomgreen', 'jones']
+
+if isnotebook():
+    from tqdm.notebook import tqdm, trange
+else:
+    from tqdm import tqdm, trange
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Pack raw html pages into page archives')
+    parser.add_argument('counties', nargs='*', help='counties to pack', default=COUNTIES)
+    parser.add_argument('--compact', help='drop superseded page copies from the archives', dest='compact', action='store_true', required=False)
+    parser.set_defaults(compact=False)
+    args = parser.parse_args()
+
+    for county in args.counties:
+        data_dir    = f'{ROOT_DIR}/data/data_{county}'
+        archive_dir = f'{data_dir}/archive'
+        fnames      = sorted(glob.glob(f'{data_dir}/*.html'))
+        archive     = PageArchive(archive_dir)
+
+        for fname in tqdm(fnames, desc=county):
+            with open(fname, 'rb') as f:
+                archive.put(os.path.basename(fname)[:-5], f.read())
+
+        archive.close()
+
+        # html files go only after the whole archive is on disk
+        for fname in fnames:
+            os.remove(fname)
+
+        if args.compact:
+            compact_archive(archive_dir)
@@ -1,16 +1,22 @@
 #!/usr/bin/python3
 
-import json, glob, platform, os, argparse, subprocess
-import pandas as pd
+import glob, collections
 import regex as re
-from cad_lib import isnotebook, ROOT_DIR, EMPTY_LIMIT
-
-CNTY_SFFX = 'callahan'
-
-if isnotebook():
-    from tqdm.notebook import tqdm, trange
-else:
-    from tqdm import tqdm, trange
+from cad_lib import isnotebook, ROOT_DIR, EMPTY_LIMIT, CountyAdapter, run_parser, parser_arguments, pdf_text_lines, LabelScanner
+
+CNTY_SFFX      = 'callahan'
+PARSER_VERSION = 1 # bump whenever parse_page output changes, to drop this county's parse cache
+OUTPUT_COLUMNS = ['prop_id', 'legal_description', 'prop_address', 'owner_name', 'owner_address', 'transfer_date',
+                  'absentee', 'empty_land', 'improvement_value', 'property_use', 'zoning', 'land_area',
+                  'recent_penalty', 'school']
+LABELS         = LabelScanner(['Property ID:', 'Legal Description:', 'Situs Address:', 'Name:<', 'Mailing Address:',
+                               'Deed Date', 'Improvement Homesite Value:', 'Improvement Non-Homesite Value:',
+                               'Property Use:', 'Zoning:', 'Acreage'])
+PROP_ID        = re.compile('\d{9}')
+TAG_SPAN       = re.compile('>.*<')
+TAG_TEXT       = re.compile('>[^>]+<')
+CELL_TEXT      = re.compile('>[^>]*</td>')
+SCHOOL         = re.compile('[^>]* ISD')
 
 def clean_substrings(input_array):
     bad_substrings = ['$', '&nbsp;', '<strong>', '</strong>', ' (+)', ' (-)', ' (=)', '<', '>']
@@ -20,130 +26,117 @@ def clean_substrings(input_array):
     element = element.replace('&amp;', '&').replace('   ', ' ').replace('  ', ' ').replace(' <br/>', ',')
     return element
 
-def get_first_match(substring, html_lines, offset=0):
-    for i, line in enumerate(html_lines):
-        if substring in line:
-            return html_lines[i+offset]
+def get_first_match(label, html_lines, label_lines, offset=0):
+    if label not in label_lines:
+        return ''
 
-    return ''
+    return html_lines[label_lines[label]+offset]
 
+def parse_page(html_text):
+    html_lines  = html_text.split('\n')
+    label_lines = LABELS.scan(html_text)
 
-if __name__ == '__main__':
+    match             = get_first_match('Property ID:', html_lines, label_lines)
+    prop_id           = int(PROP_ID.findall(match)[0])
 
-    data_dir   = f'{ROOT_DIR}/data/data_{CNTY_SFFX}'
-    output_dir = f'{ROOT_DIR}/output/output_{CNTY_SFFX}'
-    os.makedirs(output_dir, exist_ok=True)
+    match             = get_first_match('Legal Description:', html_lines, label_lines, offset=1)
+    legal_description = TAG_SPAN.findall(match)[0][1:-1]
+    legal_description = clean_substrings([legal_description])
 
-    all_taxes = {}
-    for fname in glob.glob(f'{ROOT_DIR}/data/data_{CNTY_SFFX}/*CALLAHAN*.pdf'):
-        args   = ["ps2ascii", fname]
-        res    = subprocess.run(args, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        output = res.stdout.decode('utf-8')
-        lines  = output.split('\n')
-
-        # extract all properties
-        lines       = [line.strip('\r') for line in lines]
-        first_lines = [i for i, line in enumerate(lines) if ' ID:' in line]
-        last_lines  = [i+2 for i, line in enumerate(lines) if '=====' in line]
-        ids         = [lines[i].split()[0][3:] for i in first_lines]
-
-        # dictionary of taxes, keeping only real property
-        taxes = {int(idd[1:]): lines[last_lines[i]-1].strip().split() for i, idd in enumerate(ids) if 'R' in idd}
-        all_taxes.update(taxes)
-
-
-    total_list = []
-
-    for fname in tqdm(sorted(glob.glob(f'{data_dir}/*.html'))):
-        with open(fname, 'r') as f:
-            html_text  = f.read()
-            html_lines = html_text.split('\n')
-
-
-        match             = get_first_match('Property ID:', html_lines)
-        prop_id           = int(re.findall('\d{9}', match)[0])
-
-        match             = get_first_match('Legal Description:', html_lines, offset=1)
-        legal_description = re.findall('>.*<', match)[0][1:-1]
-        legal_description = clean_substrings([legal_description])
-
-        match             = get_first_match('Situs Address:', html_lines)
-        prop_address      = re.findall('>[^>]*</td>', match)[0][1:-5]
-
-        match             = get_first_match('Name:<', html_lines)
-        owner_name        = re.findall('>[^>]+<', match)[1][1:-1].strip()
-
-        match             = get_first_match('Mailing Address:', html_lines)
-        address_array     = [address_line[1:-1].strip().replace('  ','') for address_line in re.findall('>[^>]+<', match)[1:]]
-        owner_address     =', '.join([line for line in address_array if line])
-
-        try:
-            match            = get_first_match('Deed Date', html_lines, offset=10)
-            month, day, year = re.findall('>[^>]+<', match)[0][1:-1].split('/')
-            transfer_date    = f'{year}-{int(month):02d}-{int(day):02d}'
-        except:
-            transfer_date    = ''
-
-        absentee          = 'General Homestead' not in html_text
-
-        match             = get_first_match('Improvement Homesite Value:', html_lines)
-        imp_hs_val        = int(clean_substrings([re.findall('>[^>]+<', match)[1]]).replace(',',''))
-        match             = get_first_match('Improvement Non-Homesite Value:', html_lines)
-        imp_nhs_val       = int(clean_substrings([re.findall('>[^>]+<', match)[1]]).replace(',',''))
-        imp_val           = imp_hs_val + imp_nhs_val
-
-        empty_land        = imp_val < EMPTY_LIMIT
-
-        match             = get_first_match('Property Use:', html_lines, offset=1)
-        property_use      = re.findall('>[^>]+<', match)[0][1:-1].strip()
-
-        match             = get_first_match('Zoning:', html_lines)
-        zoning            = re.findall('>[^>]+<', match)[1][1:-1].strip()
-
-        school_candidates = re.findall('[^>]* ISD', html_text)
-        school            = school_candidates[0] if school_candidates else ''
-
-        #TODO: check if there are situations with several lots
-        match             = get_first_match('Acreage', html_lines, offset=10)
-        land_area         = float(re.findall('>[^>]+<', match)[0][1:-1].replace(',','')) if match else 0
-
-        recent_penalty = 0.0
-        if prop_id in all_taxes:
-            total_due          = float(all_taxes[prop_id][-1].replace(',', ''))
-            balance            = float(all_taxes[prop_id][2].replace(',', ''))
-            recent_penalty = total_due - balance
-
-        prop_dict          = {
-                                 'prop_id'          : prop_id,
-                                 'legal_description': legal_description,
-                                 'prop_address'     : prop_address,
-                                 'owner_name'       : owner_name,
-                                 'owner_address'    : owner_address,
-                                 'transfer_date'    : transfer_date,
-                                 'absentee'         : absentee,
-                                 'empty_land'       : empty_land,
-                                 'improvement_value': imp_val,
-                                 'property_use'     : property_use,
-                                 'zoning'           : zoning,
-                                 'land_area'        : land_area,
+    match             = get_first_match('Situs Address:', html_lines, label_lines)
+    prop_address      = CELL_TEXT.findall(match)[0][1:-5]
+
+    match             = get_first_match('Name:<', html_lines, label_lines)
+    owner_name        = TAG_TEXT.findall(match)[1][1:-1].strip()
+
+    match             = get_first_match('Mailing Address:', html_lines, label_lines)
+    address_array     = [address_line[1:-1].strip().replace('  ','') for address_line in TAG_TEXT.findall(match)[1:]]
+    owner_address     =', '.join([line for line in address_array if line])
+
+    try:
+        match            = get_first_match('Deed Date', html_lines, label_lines, offset=10)
+        month, day, year = TAG_TEXT.findall(match)[0][1:-1].split('/')
+        transfer_date    = f'{year}-{int(month):02d}-{int(day):02d}'
+    except:
+        transfer_date    = ''
+
+    absentee          = 'General Homestead' not in html_text
+
+    match             = get_first_match('Improvement Homesite Value:', html_lines, label_lines)
+    imp_hs_val        = int(clean_substrings([TAG_TEXT.findall(match)[1]]).replace(',',''))
+    match             = get_first_match('Improvement Non-Homesite Value:', html_lines, label_lines)
+    imp_nhs_val       = int(clean_substrings([TAG_TEXT.findall(match)[1]]).replace(',',''))
+    imp_val           = imp_hs_val + imp_nhs_val
+
+    empty_land        = imp_val < EMPTY_LIMIT
+
+    match             = get_first_match('Property Use:', html_lines, label_lines, offset=1)
+    property_use      = TAG_TEXT.findall(match)[0][1:-1].strip()
+
+    match             = get_first_match('Zoning:', html_lines, label_lines)
+    zoning            = TAG_TEXT.findall(match)[1][1:-1].strip()
+
+    school_match      = SCHOOL.search(html_text)
+    school            = school_match.group(0) if school_match else ''
+
+    #TODO: check if there are situations with several lots
+    match             = get_first_match('Acreage', html_lines, label_lines, offset=10)
+    land_area         = float(TAG_TEXT.findall(match)[0][1:-1].replace(',','')) if match else 0.0
+
+    prop_dict          = {
+                             'prop_id'          : prop_id,
+                             'legal_description': legal_description,
+                             'prop_address'     : prop_address,
+                             'owner_name'       : owner_name,
+                             'owner_address'    : owner_address,
+                             'transfer_date'    : transfer_date,
+                             'absentee'         : absentee,
+                             'empty_land'       : empty_land,
+                             'improvement_value': imp_val,
+                             'property_use'     : property_use,
+                             'zoning'           : zoning,
+                             'land_area'        : land_area,
 #                                     'land_dict'        : land_dict,
-                                 'recent_penalty'   : recent_penalty,
+                             'recent_penalty'   : 0.0, # filled in by add_taxes()
 #                                     'recent_delinq'    : recent_delinquency,
-                                 'school'           : school,
+                             'school'           : school,
 #                                     'inactive'         : inactive
-                             }
+                         }
+
+    return prop_dict
 
-        total_list.append(prop_dict)
+def add_taxes(prop_dict):
+    # taxes come from the PDF tax roll, not the page, so they stay out of the parse cache
+    prop_id = prop_dict['prop_id']
+    if prop_id in all_taxes:
+        total_due                   = float(all_taxes[prop_id][-1].replace(',', ''))
+        balance                     = float(all_taxes[prop_id][2].replace(',', ''))
+        prop_dict['recent_penalty'] = total_due - balance
+    return prop_dict
 
-    if total_list:
-        with open(f'{output_dir}/output_{CNTY_SFFX}.json', 'w') as json_f:
-            json_f.write(json.dumps(total_list))
+def load_taxes():
+    all_taxes = {}
+    fnames    = glob.glob(f'{ROOT_DIR}/data/data_{CNTY_SFFX}/*CALLAHAN*.pdf')
 
-        df = pd.DataFrame(total_list)
-        df.to_csv(f'{output_dir}/output_{CNTY_SFFX}.csv', index=False)
+    for fname, lines in pdf_text_lines(fnames):
+        # every property block starts with an ID line and ends with a ===== line followed by its taxes
+        ids, prop_id = collections.deque(), None
+        for line in lines:
+            if prop_id is not None:
+                if 'R' in prop_id: # keeping only real property
+                    all_taxes[int(prop_id[1:])] = line.strip().split()
+                prop_id = None
+            if ' ID:' in line:
+                ids.append(line.split()[0][3:])
+            if '=====' in line and ids:
+                prop_id = ids.popleft()
 
-        node_name = platform.node()
-        if re.match('ip\-\d+\-\d+\-\d+\-\d+\..*', node_name):
-            aws_dir = '/var/www/html/output'
-            os.makedirs(aws_dir, exist_ok=True)
-            df.to_csv(f'{aws_dir}/output_{CNTY_SFFX}.csv', index=False)
+    return all_taxes
+
+
+ADAPTER = CountyAdapter(CNTY_SFFX, parse=parse_page, columns=OUTPUT_COLUMNS, version=PARSER_VERSION, postprocess=add_taxes)
+
+
+if __name__ == '__main__':
+    all_taxes = load_taxes()
+    run_parser(ADAPTER, None if isnotebook() else parser_arguments().parse_args())
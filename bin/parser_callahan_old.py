@@ -1,10 +1,10 @@
 #!/usr/bin/python3
 
-import os, subprocess, glob, json, platform, datetime
+import os, glob, json, datetime
 import regex as re
 import numpy as np
 import pandas as pd
-from cad_lib import ROOT_DIR, EMPTY_LIMIT
+from cad_lib import ROOT_DIR, EMPTY_LIMIT, pdf_text_lines, publish_csv
 
 CNTY_SFFX   = 'callahan'
 
@@ -64,14 +64,9 @@ if __name__ == '__main__':
 
     total_list = []
 
-    for fname in glob.glob(f'{ROOT_DIR}/data/data_{CNTY_SFFX}/*CALLAHAN*.pdf'):
-        args   = ["ps2ascii", fname]
-        res    = subprocess.run(args, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        output = res.stdout.decode('utf-8')
-        lines  = output.split('\n')
-
+    for fname, lines in pdf_text_lines(glob.glob(f'{ROOT_DIR}/data/data_{CNTY_SFFX}/*CALLAHAN*.pdf')):
         # extract all properties
-        lines       = [line.strip('\r') for line in lines]
+        lines       = list(lines)
         first_lines = [i for i, line in enumerate(lines) if ' ID:' in line]
         last_lines  = [i+2 for i, line in enumerate(lines) if '=====' in line]
         ids         = [lines[i].split()[0][3:] for i in first_lines]
@@ -165,9 +160,4 @@ if __name__ == '__main__':
 
         df = pd.DataFrame(total_list)
         df.to_csv(f'{output_dir}/output_{CNTY_SFFX}.csv', index=False)
-
-        node_name = platform.node()
-        if re.match('ip\-\d+\-\d+\-\d+\-\d+\..*', node_name):
-            aws_dir = '/var/www/html/output'
-            os.makedirs(aws_dir, exist_ok=True)
-            df.to_csv(f'{aws_dir}/output_{CNTY_SFFX}.csv', index=False)
+        publish_csv(f'{output_dir}/output_{CNTY_SFFX}.csv', CNTY_SFFX)
@@ -1,19 +1,28 @@
 #!/usr/bin/python3
 
-import json, glob, platform, os, argparse, datetime
+import json, os, datetime, itertools
+from operator import itemgetter
 import regex as re
-import pandas as pd
 import numpy as np
 import pickle as pkl
-from bs4 import BeautifulSoup
-from cad_lib import isnotebook, ROOT_DIR, EMPTY_LIMIT
-
-CNTY_SFFX = 'jones'
-
-if isnotebook():
-    from tqdm.notebook import tqdm, trange
-else:
-    from tqdm import tqdm, trange
+from cad_lib import isnotebook, EMPTY_LIMIT, PageFields, CountyAdapter, run_parser, parser_arguments, PARSER_DEFAULTS, output_base, publish_csv, RecordWriter, sorted_records, read_records, update_property_db, removed_ids, remove_changed_outputs
+
+CNTY_SFFX      = 'jones'
+PARSER_VERSION = 2 # bump whenever a parse function's output changes, to drop this county's parse cache
+PROP_COLUMNS   = ['prop_id', 'legal_description', 'prop_address', 'owner_name', 'owner_address', 'transfer_date',
+                  'absentee', 'empty_land', 'improvement_value', 'property_use', 'land_area', 'school']
+OWNER_COLUMNS  = ['owner_id', 'prop_id', 'recent_penalty', 'recent_delinq']
+OWNER_TABLE    = {
+                     'Parcel ID'                             : 'prop_id',
+                     'TotalPenalty & InterestAnd/Or Discount': 'recent_penalty',
+                     'Tax Due'                               : 'recent_delinq',
+                 } # DataGrid1 column title -> output column
+MERGED_COLUMNS = PROP_COLUMNS + ['recent_penalty', 'recent_delinq']
+PROP_FIELDS    = PageFields([], required=['txtParcel', 'txtLegal1', 'txtLegal2', 'txtLegal3', 'txtLegal4', 'txtPropAddress',
+                                          'txtPropCityState', 'txtName', 'txtCareof', 'txtStreet', 'txtStreetOverflow',
+                                          'txtCityState', 'txtSaleDeedDate', 'txtHomestead', 'txtImprovement', 'txtAcres',
+                                          'txtCatCode'])
+OWNER_FIELDS   = PageFields([], required=['txtOwnerID', 'DataGrid1'])
 
 def entries_to_line(soup, fields):
     soup_elements = [soup.find(id=field) for field in fields]
@@ -21,145 +30,177 @@ def entries_to_line(soup, fields):
     line          = ', '.join([cell for cell in table_cells if cell!=" "])
     return line
 
+def parse_prop_page(html_text):
+    soup              = PROP_FIELDS.select(html_text)
+    prop_id           = int(soup.find(id="txtParcel")['value'])
+    legal_description = entries_to_line(soup, [f"txtLegal{num}" for num in range(1, 5)])
+    prop_address      = entries_to_line(soup, ["txtPropAddress", "txtPropCityState"])
+    owner_name        = entries_to_line(soup, ["txtName"])
+    owner_address     = entries_to_line(soup, ["txtCareof", "txtStreet", "txtStreetOverflow", "txtCityState"])
+    transfer_date     = entries_to_line(soup, ["txtSaleDeedDate"])
+    if transfer_date:
+        transfer_date = datetime.datetime.strptime(transfer_date, "%m/%d/%Y").strftime('%Y-%m-%d')
+    absentee          = 'H' not in entries_to_line(soup, ["txtHomestead"])
+    imp_val           = float(soup.find(id="txtImprovement")['value'].replace(',',''))
+    empty_land        = imp_val < EMPTY_LIMIT
+    land_area         = float(soup.find(id="txtAcres")['value'].replace(',',''))
+    potential_schools = re.findall('>[^<]* ISD[^<]*<', html_text)
+    school            = potential_schools[-1][1:-1] if potential_schools else ''
+    property_use      = soup.find(id="txtCatCode")['value']
+    # ^---- decode it later, try the following sources after figuring out unique entries:
+    # https://comptroller.texas.gov/taxes/property-tax/docs/96-313.pdf
+    # https://www.taxnetusa.com/research/texas/sptb.php
+    # https://comptroller.texas.gov/taxes/property-tax/reappraisals/denton15-16.pdf
+
+    prop_dict         = {
+                             'prop_id'          : prop_id,
+                             'legal_description': legal_description,
+                             'prop_address'     : prop_address,
+                             'owner_name'       : owner_name,
+                             'owner_address'    : owner_address,
+                             'transfer_date'    : transfer_date,
+                             'absentee'         : absentee,
+                             'empty_land'       : empty_land,
+                             'improvement_value': int(imp_val),
+                             'property_use'     : property_use,
+#                                     'zoning'           : zoning,
+                             'land_area'        : land_area,
+#                                     'land_dict'        : land_dict,
+#                                     'recent_penalty'   : recent_penalty,
+#                                     'recent_delinq'    : recent_delinquency,
+                             'school'           : school,
+#                                     'inactive'         : inactive
+                         }
+
+    return prop_dict
+
+def parse_owner_page(html_text):
+    soup        = OWNER_FIELDS.select(html_text)
+    owner_id    = int(soup.find(id="txtOwnerID")['value'])
+    delinq_flag = 'delinquent taxes due' in html_text
+
+    # parsing the tax table, fixing up html->table parsing problems
+    rows = []
+    for row in soup.find(id="DataGrid1").find_all('tr'):
+        cols = [ele.text.strip() for ele in row.find_all('td')]
+        rows.append([ele for ele in cols if ele and ele not in ['Homestead', 'Receipt']])
+
+    header  = rows[0]
+    idx     = {column: header.index(title) for title, column in OWNER_TABLE.items()}
+    records = []
+    for row in rows[1:]:
+        records.append({
+                           'owner_id'      : owner_id,
+                           'prop_id'       : int(row[idx['prop_id']]),
+                           'recent_penalty': float(row[idx['recent_penalty']].replace(',', '')),
+                           'recent_delinq' : float(row[idx['recent_delinq']].replace(',', '')) if delinq_flag else 0.0,
+                       })
+
+    return records
+
+
+def merge_owners(prop_records, owner_records, missing_owners):
+    """
+    Left join of property and owner records, both sorted by prop_id, into the merged output:
+    a property gets one record per owner row (None for the owner columns if it has none, its
+    owner_name then going to missing_owners). Repeated records of a property are dropped.
+    """
+    owners            = itertools.groupby(owner_records, key=itemgetter('prop_id'))
+    owner_id, matches = next(owners, (None, None))
+
+    for prop_id, props in itertools.groupby(prop_records, key=itemgetter('prop_id')):
+        while owner_id is not None and owner_id<prop_id:
+            owner_id, matches = next(owners, (None, None))
+        owner_rows = list(matches) if owner_id==prop_id else [None]
+
+        seen = set()
+        for prop_dict in props:
+            if owner_rows==[None]:
+                missing_owners.add(prop_dict['owner_name'])
+
+            for owner in owner_rows:
+                record  = {
+                              **prop_dict,
+                              'recent_penalty': owner['recent_penalty'] if owner else None,
+                              'recent_delinq' : owner['recent_delinq'] if owner else None,
+                          }
+                row_key = json.dumps([record, owner and owner['owner_id']])
+                if row_key not in seen:
+                    seen.add(row_key)
+                    yield record
+
+def changed_merge_inputs(args):
+    """
+    Property and owner records, sorted by prop_id, for the merge of a --changed_only run: every
+    property with a changed property or owner page, or once listed on a changed owner page, with
+    its changed records completed from the full outputs, i.e. its full property record unless
+    that changed and its full owner rows of the owners whose page did not change (nor was removed).
+    """
+    def records(adapter, changed):
+        fname = f'{output_base(adapter, args if changed else None)}.jsonl'
+        return list(read_records(fname)) if os.path.exists(fname) else []
+
+    changed_props  = records(PROP_ADAPTER, True)
+    changed_owners = records(OWNER_ADAPTER, True)
+    full_owners    = records(OWNER_ADAPTER, False)
+    fresh_props    = {record['prop_id'] for record in changed_props}
+    fresh_owners   = {record['owner_id'] for record in changed_owners} | removed_ids(OWNER_ADAPTER, args)
+    prop_ids       = {record['prop_id'] for record in changed_props+changed_owners} | \
+                     {record['prop_id'] for record in full_owners if record['owner_id'] in fresh_owners} # owners' former properties
+    props          = changed_props + [record for record in records(PROP_ADAPTER, False)
+                                      if record['prop_id'] in prop_ids-fresh_props]
+    owners         = changed_owners + [record for record in full_owners
+                                       if record['prop_id'] in prop_ids and record['owner_id'] not in fresh_owners]
+    return sorted(props, key=itemgetter('prop_id')), sorted(owners, key=itemgetter('prop_id'))
+
+PROP_ADAPTER   = CountyAdapter(CNTY_SFFX, name=f'{CNTY_SFFX}_prop', parse=parse_prop_page, pattern='prop_*',
+                               columns=PROP_COLUMNS, version=PARSER_VERSION, publish=False)
+OWNER_ADAPTER  = CountyAdapter(CNTY_SFFX, name=f'{CNTY_SFFX}_owners', parse=parse_owner_page, pattern='owner_*',
+                               columns=OWNER_COLUMNS, version=PARSER_VERSION, many=True, publish=False)
+MERGED_ADAPTER = CountyAdapter(CNTY_SFFX)
+
 
 if __name__ == '__main__':
 
     if isnotebook():
+        args                                       = PARSER_DEFAULTS
         parse_properties, parse_owners, merge_data = False, False, True
     else:
-        parser = argparse.ArgumentParser(description='What to generate')
+        parser = parser_arguments('What to generate')
         parser.add_argument('--properties', help='parse properties', dest='properties', action='store_true', required=False)
         parser.add_argument('--owners', help='parse owners', dest='owners', action='store_true', required=False)
         parser.add_argument('--merge', help='merge owners and properties', dest='merge', action='store_true', required=False)
         parser.set_defaults(owners=False, properties=False, merge=False)
-        args   = parser.parse_args()
+        args                                       = parser.parse_args()
         parse_properties, parse_owners, merge_data = args.properties, args.owners, args.merge
 
-    data_dir   = f'{ROOT_DIR}/data/data_{CNTY_SFFX}'
-    output_dir = f'{ROOT_DIR}/output/output_{CNTY_SFFX}'
-    os.makedirs(output_dir, exist_ok=True)
-
-    output_fname_owners = f'{output_dir}/output_{CNTY_SFFX}_owners.json'
-    output_fname_prop   = f'{output_dir}/output_{CNTY_SFFX}_prop.json'
-
-
     if parse_properties:
-        total_list = []
-
-        for fname in tqdm(sorted(glob.glob(f'{data_dir}/prop_*.html'))):
-            with open(fname, 'r') as f:
-                html_text = f.read()
-
-            soup              = BeautifulSoup(html_text, 'lxml')
-            prop_id           = int(soup.find(id="txtParcel")['value'])
-            legal_description = entries_to_line(soup, [f"txtLegal{num}" for num in range(1, 5)])
-            prop_address      = entries_to_line(soup, ["txtPropAddress", "txtPropCityState"])
-            owner_name        = entries_to_line(soup, ["txtName"])
-            owner_address     = entries_to_line(soup, ["txtCareof", "txtStreet", "txtStreetOverflow", "txtCityState"])
-            transfer_date     = entries_to_line(soup, ["txtSaleDeedDate"])
-            if transfer_date:
-                transfer_date = datetime.datetime.strptime(transfer_date, "%m/%d/%Y").strftime('%Y-%m-%d')
-            absentee          = 'H' not in entries_to_line(soup, ["txtHomestead"])
-            imp_val           = float(soup.find(id="txtImprovement")['value'].replace(',',''))
-            empty_land        = imp_val < EMPTY_LIMIT
-            land_area         = float(soup.find(id="txtAcres")['value'].replace(',',''))
-            potential_schools = re.findall('>[^<]* ISD[^<]*<', html_text)
-            school            = potential_schools[-1][1:-1] if potential_schools else ''
-            property_use      = soup.find(id="txtCatCode")['value']
-            # ^---- decode it later, try the following sources after figuring out unique entries:
-            # https://comptroller.texas.gov/taxes/property-tax/docs/96-313.pdf
-            # https://www.taxnetusa.com/research/texas/sptb.php
-            # https://comptroller.texas.gov/taxes/property-tax/reappraisals/denton15-16.pdf
-
-            prop_dict         = {
-                                     'prop_id'          : prop_id,
-                                     'legal_description': legal_description,
-                                     'prop_address'     : prop_address,
-                                     'owner_name'       : owner_name,
-                                     'owner_address'    : owner_address,
-                                     'transfer_date'    : transfer_date,
-                                     'absentee'         : absentee,
-                                     'empty_land'       : empty_land,
-                                     'improvement_value': int(imp_val),
-                                     'property_use'     : property_use,
-#                                     'zoning'           : zoning,
-                                     'land_area'        : land_area,
-#                                     'land_dict'        : land_dict,
-#                                     'recent_penalty'   : recent_penalty,
-#                                     'recent_delinq'    : recent_delinquency,
-                                     'school'           : school,
-#                                     'inactive'         : inactive
-                                 }
-
-            total_list.append(prop_dict)
-
-        if total_list:
-            with open(output_fname_prop, 'w') as json_f:
-                json_f.write(json.dumps(total_list))
+        run_parser(PROP_ADAPTER, args)
 
     if parse_owners:
-        total_list = []
-
-        for fname in tqdm(sorted(glob.glob(f'{data_dir}/owner_*.html'))):
-            with open(fname, 'r') as f:
-                html_text = f.read()
-
-            soup        = BeautifulSoup(html_text, 'lxml')
-            owner_id    = int(soup.find(id="txtOwnerID")['value'])
-            delinq_flag = 'delinquent taxes due' in html_text
-
-            # parsing the tax table
-            data       = []
-            table_body = soup.find(id="DataGrid1")
-            rows       = table_body.find_all('tr')
-            for row in rows:
-                cols = row.find_all('td')
-                cols = [ele.text.strip() for ele in cols]
-                data.append([ele for ele in cols if ele])
-
-            # fixing up html->table parsing problems
-            data           = [[el for el in row if el not in ['Homestead', 'Receipt']] for row in data]
-            df             = pd.DataFrame(data)
-            df.columns     = df.iloc[0]
-            df             = df[1:]
-            df['owner_id'] = owner_id
-            df             = df.rename(columns={'Parcel ID': 'prop_id',
-                                                'TotalPenalty & InterestAnd/Or Discount':'recent_penalty',
-                                                'Tax Due':'recent_delinq'})
-            df             = df[['owner_id', 'prop_id', 'recent_penalty', 'recent_delinq']]
-            df.prop_id     = df.prop_id.astype(int)
-
-            for col in ['recent_penalty', 'recent_delinq']:
-                df[col] = df[col].map(lambda x: x.replace(',','')).astype(float)
-
-            if not delinq_flag:
-                df.recent_delinq = 0.0
-
-            total_list.extend(df.to_dict('records'))
-
-        if total_list:
-            with open(output_fname_owners, 'w') as json_f:
-                json_f.write(json.dumps(total_list))
+        run_parser(OWNER_ADAPTER, args)
 
     if merge_data:
-        df1            = pd.read_json(output_fname_prop)
-        df2            = pd.read_json(output_fname_owners)
-        df             = df1.merge(df2, on='prop_id', how='left')
-        missing_owners = np.unique(df[df.owner_id.isna()].owner_name.values)
-
-        with open(f'{output_dir}/missing_owners.pkl', 'wb') as f:
-            pkl.dump(missing_owners, f)
-
-        df.drop_duplicates(inplace=True)
-        df.drop(columns=['owner_id'], inplace=True)
-
-        with open(f'{output_dir}/output_{CNTY_SFFX}.json', 'w') as json_f:
-                        json_f.write(json.dumps(df.to_dict('records')))
-
-        df.to_csv(f'{output_dir}/output_{CNTY_SFFX}.csv', index=False)
-
-        node_name = platform.node()
-        if re.match('ip\-\d+\-\d+\-\d+\-\d+\..*', node_name):
-            aws_dir = '/var/www/html/output'
-            os.makedirs(aws_dir, exist_ok=True)
-            df.to_csv(f'{aws_dir}/output_{CNTY_SFFX}.csv', index=False)
+        output_fname   = output_base(MERGED_ADAPTER, args)
+        main_output    = output_fname==output_base(MERGED_ADAPTER) # not a snapshot or changed pages only
+        missing_owners = set()
+        if args.changed_only and not args.snapshot: # the changed pages alone lack the other half of their records
+            prop_records, owner_records = changed_merge_inputs(args)
+        else:
+            prop_records  = sorted_records(f'{output_base(PROP_ADAPTER, args)}.jsonl', key=itemgetter('prop_id'))
+            owner_records = sorted_records(f'{output_base(OWNER_ADAPTER, args)}.jsonl', key=itemgetter('prop_id'))
+
+        remove_changed_outputs(MERGED_ADAPTER, args)
+        with RecordWriter(output_fname, json_array=True, columns=MERGED_COLUMNS) as writer:
+            for record in merge_owners(prop_records, owner_records, missing_owners):
+                writer.write(record)
+
+        removed = removed_ids(PROP_ADAPTER, args)
+        if (writer.count or removed) and not args.snapshot:
+            update_property_db(CNTY_SFFX, f'{output_fname}.jsonl' if writer.count else None, full=main_output, removed=removed)
+
+        if main_output: # the fetcher looks these up on the live website
+            with open(f'{MERGED_ADAPTER.output_dir()}/missing_owners.pkl', 'wb') as f:
+                pkl.dump(np.unique(list(missing_owners)), f)
+
+            publish_csv(f'{output_fname}.csv', CNTY_SFFX)
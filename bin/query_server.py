@@ -0,0 +1,147 @@
+#!/usr/bin/python3
+
+import io, csv, json, argparse, threading, functools, contextlib
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+from cad_lib import COLUMN_TYPES, PropertyDB
+
+CACHE_SIZE    = 256   # query results kept in memory
+PAGE_SIZE     = 1000  # records per page unless page_size is given
+MAX_PAGE_SIZE = 10000
+COLUMNS       = ['county'] + [column for column in COLUMN_TYPES if column!='owner_id']
+FLAGS         = ['absentee', 'empty_land', 'inactive']
+TRUE_VALUES   = ('1', 'true', 'yes')
+FALSE_VALUES  = ('0', 'false', 'no')
+
+def flag_value(value):
+    if value.lower() in TRUE_VALUES:
+        return 1
+    if value.lower() in FALSE_VALUES:
+        return 0
+    raise ValueError(f'{value} is not a yes/no value')
+
+# query parameter -> (SQL condition, value conversion), list values are comma separated
+FILTERS = {
+              'county'      : ('county IN ({})', list),
+              'school'      : ('school IN ({})', list),
+              'zoning'      : ('zoning IN ({})', list),
+              'property_use': ('property_use IN ({})', list),
+              'min_acres'   : ('land_area>=?', float),
+              'max_acres'   : ('land_area<=?', float),
+              'min_penalty' : ('recent_penalty>=?', float),
+              'max_penalty' : ('recent_penalty<=?', float),
+              'min_delinq'  : ('recent_delinq>=?', float),
+              'max_delinq'  : ('recent_delinq<=?', float),
+              **{flag: (f'{flag}=?', flag_value) for flag in FLAGS},
+          }
+
+_db      = {'db': None} # one read-only connection shared by the server threads, opened on first use
+_db_lock = threading.Lock()
+
+@contextlib.contextmanager
+def database():
+    with _db_lock:
+        if _db['db'] is None:
+            _db['db'] = PropertyDB(readonly=True)
+        yield _db['db']
+
+def where_clause(params):
+    """SQL condition and its parameters for the FILTERS among the query params"""
+    conditions, values = [], []
+    for name, value in params.items():
+        condition, convert = FILTERS[name]
+        if convert is list:
+            items = [item.strip() for item in value.split(',')]
+            conditions.append(condition.format(', '.join('?'*len(items))))
+            values.extend(items)
+        else:
+            conditions.append(condition)
+            values.append(convert(value))
+    return ' AND '.join(conditions) or '1', values
+
+def to_record(row):
+    record = {column: row[column] for column in COLUMNS}
+    for flag in FLAGS:
+        record[flag] = None if record[flag] is None else bool(record[flag])
+    record['land_dict'] = None if record['land_dict'] is None else json.loads(record['land_dict'])
+    return record
+
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def run_query(data_version, filters, page, page_size):
+    """
+    Total count and the records of one page of a query, cached for the data_version it ran on,
+    so that an entry is never served after a parser updates the database.
+    """
+    condition, values = where_clause(dict(filters))
+    with database() as db:
+        total = db.query(f'SELECT COUNT(*) AS total FROM properties WHERE {condition}', values)[0]['total']
+        rows  = db.query(f'SELECT * FROM properties WHERE {condition} ORDER BY county, prop_id, seq LIMIT ? OFFSET ?',
+                         values + [page_size, (page-1)*page_size])
+    return total, [to_record(row) for row in rows]
+
+_version = {'data': None}
+
+def cached_query(filters, page, page_size):
+    with database() as db:
+        data_version = db.data_version()
+    if data_version!=_version['data']: # new data published, drop the old results
+        run_query.cache_clear()
+        _version['data'] = data_version
+    return run_query(data_version, filters, page, page_size)
+
+
+class QueryHandler(BaseHTTPRequestHandler):
+    """
+    GET /properties?<filters>&format=json|csv&page=<n>&page_size=<n> with the FILTERS as query
+    parameters. JSON responses hold total, page, page_size and records; CSV responses are the
+    records with the total in the X-Total-Count header.
+    """
+
+    def do_GET(self):
+        url    = urlparse(self.path)
+        params = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        if url.path.rstrip('/') not in ('/properties', '/api/properties'):
+            return self.reply(404, {'error': f'unknown path {url.path}'})
+
+        try:
+            fmt       = params.pop('format', 'json')
+            page      = int(params.pop('page', 1))
+            page_size = int(params.pop('page_size', PAGE_SIZE))
+            unknown   = set(params)-set(FILTERS)
+            if unknown:
+                raise ValueError(f'unknown parameters {", ".join(sorted(unknown))}')
+            if fmt not in ('json', 'csv') or page<1 or not 0<page_size<=MAX_PAGE_SIZE:
+                raise ValueError(f'format must be json or csv, page at least 1, page_size up to {MAX_PAGE_SIZE}')
+            where_clause(params) # converts the values, raising ValueError on bad ones
+        except ValueError as e:
+            return self.reply(400, {'error': str(e)})
+
+        total, records = cached_query(tuple(sorted(params.items())), page, page_size)
+        if fmt=='csv':
+            buffer = io.StringIO()
+            writer = csv.DictWriter(buffer, fieldnames=COLUMNS, lineterminator='\n')
+            writer.writeheader()
+            writer.writerows(records)
+            self.reply(200, buffer.getvalue(), 'text/csv', {'X-Total-Count': total})
+        else:
+            self.reply(200, {'total': total, 'page': page, 'page_size': page_size, 'records': records})
+
+    def reply(self, status, body, content_type='application/json', headers=None):
+        data = (body if isinstance(body, str) else json.dumps(body)).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, str(value))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='JSON/CSV query service over the property database')
+    parser.add_argument('-host', help='address to listen on (default: localhost, behind the Apache proxy)', required=False, default='127.0.0.1')
+    parser.add_argument('-port', type=int, help='port to listen on', required=False, default=8000)
+    args = parser.parse_args()
+
+    ThreadingHTTPServer((args.host, args.port), QueryHandler).serve_forever()